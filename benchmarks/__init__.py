@@ -0,0 +1,12 @@
+'''
+# Description
+Benchmarks for the hot paths of Thoth, with synthetic Quantum ESPRESSO files.
+
+The benchmarks follow the [asv](https://asv.readthedocs.io/) conventions,
+so they can be run with `asv run` or `asv continuous <commit_1> <commit_2>` from the root of the repository.
+They can also be run without asv with `python3 -m benchmarks.run`, check `benchmarks.run` for details.
+
+Sizes range from KB to MB by default; set the `THOTH_BENCH_LARGE=1` environment variable to include GB files.
+
+---
+'''
@@ -0,0 +1,76 @@
+'''
+# Description
+Benchmarks for the time to import Thoth and its submodules,
+measured with `python -X importtime` in new processes.
+Heavy dependencies such as pandas must only be imported when they are used,
+which can be checked as a regular test, failing if any of them is imported:
+```bash
+python3 -m benchmarks.bench_import
+```
+
+---
+'''
+
+
+import subprocess
+import sys
+
+
+HEAVY = ('pandas', 'numpy', 'asyncio', 'pyarrow', 'concurrent.futures')
+'''Modules that should not be imported just by importing Thoth.'''
+
+
+class Import:
+    '''Import of Thoth and its submodules.'''
+    params = [['thoth', 'thoth.file', 'thoth.text', 'thoth.extract', 'thoth.call', 'thoth.qe']]
+    param_names = ['module']
+    timeout = 120
+
+    def track_import_time(self, module):
+        return min(_import_time(module) for _ in range(5))
+    track_import_time.unit = 'ms'
+
+    def track_heavy_modules(self, module):
+        return len(_heavy_modules(module))
+    track_heavy_modules.unit = 'modules'
+
+
+def check_heavy_modules() -> None:
+    '''
+    Raises an AssertionError if importing Thoth or any of its submodules imports the `HEAVY` modules.
+    '''
+    for module in Import.params[0]:
+        imported = _heavy_modules(module)
+        assert not imported, f'import {module} also imports {", ".join(imported)}'
+    return None
+
+
+def _heavy_modules(module:str) -> list:
+    '''
+    Returns the `HEAVY` modules imported when importing a `module` in a new process with `python -X importtime`.
+    '''
+    code = f'import sys, {module}; print(" ".join(name for name in {HEAVY!r} if name in sys.modules))'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    return process.stdout.split()
+
+
+def _import_time(module:str) -> float:
+    '''
+    Returns the milliseconds needed to import a `module` in a new process,
+    adding the cumulative times of the Thoth modules reported by `python -X importtime`.
+    '''
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             stderr=subprocess.PIPE, text=True, check=True)
+    total = 0
+    for line in process.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[2].startswith(' thoth'):
+            continue  # Only top-level Thoth imports, which include their dependencies
+        total += int(parts[1])
+    return total / 1000
+
+
+if __name__ == '__main__':
+    check_heavy_modules()
+    print('No heavy modules imported')
@@ -0,0 +1,87 @@
+'''
+# Description
+Benchmarks for `thoth.qe`.
+
+---
+'''
+
+
+import os
+import time
+import numpy
+import thoth as th
+from . import generate
+
+
+class ReadOut:
+    '''Reading of single output files.'''
+    params = [generate.sizes()]
+    param_names = ['size']
+    timeout = 600
+
+    def setup(self, size):
+        self.file = generate.qe_out(None, size)
+        self.size_bytes = os.path.getsize(self.file)
+
+    def time_read_out(self, size):
+        th.qe.read_out(self.file)
+
+    def time_read_traj(self, size):
+        th.qe.read_traj(self.file)
+
+    def peakmem_read_out(self, size):
+        th.qe.read_out(self.file)
+
+    def track_read_out_throughput(self, size):
+        start = time.perf_counter()
+        th.qe.read_out(self.file)
+        return self.size_bytes / 1e6 / (time.perf_counter() - start)
+    track_read_out_throughput.unit = 'MB/s'
+
+
+class ReadConstrained:
+    '''Reading of relaxations where only some atoms have `if_pos` constraints.'''
+    params = [[1, 4]]
+    param_names = ['fixed']
+
+    def setup(self, fixed):
+        self.file = generate.qe_out(None, 'MB', fixed=fixed)
+
+    def time_read_traj(self, fixed):
+        th.qe.read_traj(self.file)
+
+    def track_read_traj_nan(self, fixed):
+        '''Number of missing values in the trajectory, which should always be zero.'''
+        traj = th.qe.read_traj(self.file)
+        return int(sum(numpy.isnan(traj[key]).sum() for key in ('Forces', 'Positions', 'Cell')))
+    track_read_traj_nan.unit = 'values'
+
+
+class ReadDirs:
+    '''Reading of full directories with many calculations.'''
+    params = ([100, 1000], [1, None])
+    param_names = ['folders', 'workers']
+    number = 1
+    repeat = 3
+    timeout = 1200
+
+    def setup(self, folders, workers):
+        self.directory = generate.qe_dirs(folders)
+
+    def teardown(self, folders, workers):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                os.remove(path)
+
+    def time_read_dirs(self, folders, workers):
+        th.qe.read_dirs(self.directory, workers=workers)
+
+    def peakmem_read_dirs(self, folders, workers):
+        th.qe.read_dirs(self.directory, workers=workers)
+
+    def track_read_dirs_files_per_second(self, folders, workers):
+        start = time.perf_counter()
+        th.qe.read_dirs(self.directory, workers=workers)
+        return 2 * folders / (time.perf_counter() - start)
+    track_read_dirs_files_per_second.unit = 'files/s'
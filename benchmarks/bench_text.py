@@ -0,0 +1,184 @@
+'''
+# Description
+Benchmarks for `thoth.text` and `thoth.extract`.
+
+---
+'''
+
+
+import os
+import shutil
+import time
+import thoth as th
+from . import generate
+
+
+MATCHES = [10, 1000, 100_000]
+'''Number of matches in the benchmarked files.'''
+
+
+def _check(size:str, matches:int) -> None:
+    '''
+    Skips the combinations with more matches than lines, as in asv.
+    '''
+    if matches * 64 > generate.SIZES[size]:
+        raise NotImplementedError(f'Too many matches for a {size} file')
+
+
+def _throughput(function, size_bytes:int, repeat:int=3) -> float:
+    '''
+    Returns the best throughput in MB/s of calling `function` over `size_bytes`.
+    '''
+    best = min(_elapsed(function) for _ in range(repeat))
+    return size_bytes / 1e6 / best
+
+
+def _elapsed(function) -> float:
+    '''
+    Returns the seconds spent calling `function`.
+    '''
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+class Find:
+    '''Searches that do not modify the file.'''
+    params = (generate.sizes(), MATCHES)
+    param_names = ['size', 'matches']
+    timeout = 600
+
+    def setup(self, size, matches):
+        _check(size, matches)
+        self.file = generate.text_file(size, matches)
+        self.size_bytes = os.path.getsize(self.file)
+
+    def time_find_pos(self, size, matches):
+        th.text.find_pos('key', self.file)
+
+    def time_find_pos_last(self, size, matches):
+        th.text.find_pos('key', self.file, -1)
+
+    def time_find_pos_regex(self, size, matches):
+        th.text.find_pos_regex(r'key\s*=\s*\d', self.file)
+
+    def time_find_pos_regex_last(self, size, matches):
+        th.text.find_pos_regex(r'key\s*=\s*\d', self.file, -1)
+
+    def time_find_pos_many(self, size, matches):
+        th.text.find_pos_many({'key': 'key', 'missing': 'missing', 'numbers': '6.7890'}, self.file, -1)
+
+    def time_find(self, size, matches):
+        th.text.find('key', self.file)
+
+    def time_find_additional_lines(self, size, matches):
+        th.text.find('key', self.file, 0, 3)
+
+    def time_find_regex(self, size, matches):
+        th.text.find(r'key\s*=\s*\d', self.file, 0, 0, False, True)
+
+    def time_find_many(self, size, matches):
+        th.text.find_many({'key': 'key', 'missing': 'missing'}, self.file, 0, 1)
+
+    def time_line_index(self, size, matches):
+        th.text._line_indexes.clear()
+        th.text.line_index(self.file)
+
+    def peakmem_find(self, size, matches):
+        th.text.find('key', self.file, 0, 3)
+
+    def peakmem_find_pos_regex(self, size, matches):
+        th.text.find_pos_regex(r'key\s*=\s*\d', self.file, -1)
+
+    def track_find_throughput(self, size, matches):
+        return _throughput(lambda: th.text.find('key', self.file), self.size_bytes)
+    track_find_throughput.unit = 'MB/s'
+
+    def track_find_pos_regex_throughput(self, size, matches):
+        return _throughput(lambda: th.text.find_pos_regex(r'key\s*=\s*\d', self.file), self.size_bytes)
+    track_find_pos_regex_throughput.unit = 'MB/s'
+
+
+class Edit:
+    '''Functions that modify the file, running over a fresh copy each time.'''
+    params = (generate.sizes(), MATCHES)
+    param_names = ['size', 'matches']
+    number = 1
+    repeat = 5
+    timeout = 600
+
+    def setup(self, size, matches):
+        _check(size, matches)
+        original = generate.text_file(size, matches)
+        self.file = original + '.edit'
+        shutil.copyfile(original, self.file)
+        self.size_bytes = os.path.getsize(self.file)
+
+    def teardown(self, size, matches):
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+    def time_replace(self, size, matches):
+        th.text.replace('KEY', 'key', self.file)
+
+    def time_replace_regex(self, size, matches):
+        th.text.replace('key = 2.0', r'key\s*=\s*1\.0', self.file, 0, True)
+
+    def time_replace_line(self, size, matches):
+        th.text.replace_line('new line with the key', 'key', self.file)
+
+    def time_correct_with_dict(self, size, matches):
+        th.text.correct_with_dict(self.file, {'key': 'KEY', 'filler': 'FILLER', 'numbers': 'NUMBERS'})
+
+    def time_edit_session(self, size, matches):
+        with th.text.Edit(self.file) as edit:
+            edit.replace('KEY', 'key', 10)
+            edit.replace_line('new line', 'filler', -10)
+            edit.insert_under('inserted line', 'additional', 1)
+
+    def time_insert_under(self, size, matches):
+        th.text.insert_under('inserted line', 'key', self.file)
+
+    def time_replace_under(self, size, matches):
+        th.text.replace_under('replaced line', 'key', self.file)
+
+    def time_delete_under(self, size, matches):
+        th.text.delete_under('key', self.file)
+
+    def time_replace_between(self, size, matches):
+        th.text.replace_between('replaced line', 'key', 'additional', self.file)
+
+    def time_delete_between(self, size, matches):
+        th.text.delete_between('key', 'additional', self.file)
+
+    def peakmem_replace(self, size, matches):
+        th.text.replace('KEY', 'key', self.file)
+
+    def track_replace_throughput(self, size, matches):
+        return self.size_bytes / 1e6 / _elapsed(lambda: th.text.replace('KEY', 'key', self.file))
+    track_replace_throughput.unit = 'MB/s'
+
+
+class Extract:
+    '''Extraction of values from many lines.'''
+    params = [1000, 100_000]
+    param_names = ['lines']
+
+    def setup(self, lines):
+        self.lines = [f'     Total force =     {i * 1e-4:.6f}     Total SCF correction =     0.000012' for i in range(lines)]
+
+    def time_number(self, lines):
+        for line in self.lines:
+            th.extract.number(line, 'Total force')
+
+    def time_numbers(self, lines):
+        for line in self.lines:
+            th.extract.numbers(line, ['Total force', 'Total SCF correction'])
+
+    def time_string(self, lines):
+        for line in self.lines:
+            th.extract.string(line, 'Total force', 'Total SCF')
+
+    def time_column(self, lines):
+        for line in self.lines:
+            th.extract.column(line, 3)
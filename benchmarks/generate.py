@@ -0,0 +1,163 @@
+'''
+# Description
+Generators of synthetic files for the benchmarks.
+The files are created once inside a temporary folder, and reused afterwards.
+Set the `THOTH_BENCH_DATA` environment variable to use a different folder.
+
+# Index
+- `sizes()`
+- `text_file()`
+- `qe_in()`
+- `qe_out()`
+- `qe_dirs()`
+
+---
+'''
+
+
+import os
+import random
+import tempfile
+
+
+SIZES = {
+    'KB': 10_000,
+    'MB': 10_000_000,
+    'GB': 1_000_000_000,
+}
+'''Approximate sizes in bytes of the generated files.'''
+
+DATA = os.environ.get('THOTH_BENCH_DATA', os.path.join(tempfile.gettempdir(), 'thoth-benchmarks'))
+'''Folder where the generated files are stored.'''
+
+
+def sizes() -> list:
+    '''
+    Returns the size names to benchmark.
+    GB files are only included if the `THOTH_BENCH_LARGE` environment variable is set.
+    '''
+    if os.environ.get('THOTH_BENCH_LARGE'):
+        return list(SIZES)
+    return ['KB', 'MB']
+
+
+def text_file(size:str='MB', matches:int=1000) -> str:
+    '''
+    Returns the path of a text file of a given `size` name,
+    with `matches` lines containing the keyword `key` evenly spread over the file.
+    '''
+    path = _path(f'text_{size}_{matches}.txt')
+    if os.path.exists(path):
+        return path
+    filler = 'line of filler text with some numbers 1.2345 6.7890 to search\n'
+    target = 'line 123 with the key = 1.0 and additional text\n'
+    total_lines = SIZES[size] // len(filler)
+    every = max(total_lines // max(matches, 1), 1)
+    block = filler * (every - 1) + target
+    with open(path + '.tmp', 'w') as f:
+        for _ in range(min(matches, total_lines)):
+            f.write(block)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def qe_in(path:str, ecutwfc:float=60.0, nat:int=8) -> str:
+    '''
+    Writes a synthetic Quantum ESPRESSO input file to `path`, with `nat` atoms.
+    '''
+    positions = ''.join(f'Si {i/nat:.6f} {i/nat:.6f} {i/nat:.6f}\n' for i in range(nat))
+    content = (
+        "&CONTROL\n  calculation = 'relax', prefix = 'si'\n  pseudo_dir = './pseudo/'\n  etot_conv_thr = 1.0d-6\n/\n"
+        f"&SYSTEM\n  ibrav = 0\n  nat = {nat}, ntyp = 1\n  ecutwfc = {ecutwfc}\n  celldm(1) = 10.2\n/\n"
+        "&ELECTRONS\n  conv_thr = 1.D-10\n  mixing_beta = 0.7\n/\n&IONS\n/\n"
+        "ATOMIC_SPECIES\n  Si  28.0855  Si.pbe-n-rrkjus_psl.1.0.0.UPF\n"
+        "CELL_PARAMETERS alat\n  1.0 0.0 0.0\n  0.0 1.0 0.0\n  0.0 0.0 1.0\n"
+        f"ATOMIC_POSITIONS crystal\n{positions}"
+        "K_POINTS automatic\n  4 4 4 0 0 0\n"
+    )
+    with open(path, 'w') as f:
+        f.write(content)
+    return path
+
+
+def qe_out(path:str=None, size:str='MB', nat:int=8, done:bool=True, fixed:int=0) -> str:
+    '''
+    Writes a synthetic Quantum ESPRESSO relax output file of a given `size` name, with `nat` atoms.
+    The positions of the first `fixed` atoms are followed by their `if_pos` constraints, as in a constrained relaxation.
+    If no `path` is given, the file is stored in the data folder and reused.
+    '''
+    if path is None:
+        path = _path(f'qe_{size}_{nat}_{fixed}.out' if fixed else f'qe_{size}_{nat}.out')
+        if os.path.exists(path):
+            return path
+    rng = random.Random(nat)
+    header = (
+        '     Program PWSCF v.7.2 starts on 18Oct2026 at 10: 0: 0 \n'
+        f'     number of atoms/cell      = {nat:8d}\n'
+        '     number of atomic types    =        1\n\n'
+    )
+    lines = [header]
+    written = len(header)
+    step = 0
+    while written < SIZES[size] or step == 0:
+        step_lines = []
+        for iteration in range(1, 6):
+            step_lines.append(f'     iteration #  {iteration}     ecut=    60.00 Ry     beta= 0.70\n')
+            step_lines.append(f'     total energy              =    -{100 + step + iteration * 0.1:.8f} Ry\n\n')
+        step_lines.append(f'!    total energy              =    -{100.5 + step:.8f} Ry\n\n')
+        step_lines.append('     Forces acting on atoms (cartesian axes, Ry/au):\n\n')
+        for atom in range(nat):
+            force = [rng.uniform(-0.01, 0.01) for _ in range(3)]
+            step_lines.append(f'     atom {atom + 1:4d} type  1   force = {force[0]:14.8f}{force[1]:14.8f}{force[2]:14.8f}\n')
+        step_lines.append(f'\n     Total force =     {0.01 / (step + 1):.6f}     Total SCF correction =     0.000012\n\n')
+        step_lines.append(f'     number of bfgs steps    =    {step}\n\n')
+        step_lines.append('CELL_PARAMETERS (alat= 10.00000000)\n   1.000000000   0.000000000   0.000000000\n'
+                          '   0.000000000   1.000000000   0.000000000\n   0.000000000   0.000000000   1.000000000\n\n')
+        step_lines.append('ATOMIC_POSITIONS (crystal)\n')
+        for atom in range(nat):
+            constraint = '    0   0   0' if atom < fixed else ''
+            step_lines.append('Si  ' + ''.join(f'{rng.random():16.10f}' for _ in range(3)) + constraint + '\n')
+        step_lines.append('\n\n')
+        chunk = ''.join(step_lines)
+        lines.append(chunk)
+        written += len(chunk)
+        step += 1
+    lines.append('     bfgs converged in   3 scf cycles and   2 bfgs steps\n')
+    lines.append('     PWSCF        :      1m23.45s CPU      1m30.00s WALL\n\n')
+    if done:
+        lines.append('   JOB DONE.\n')
+    with open(path + '.tmp', 'w') as f:
+        f.writelines(lines)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def qe_dirs(folders:int=100, size:str='KB') -> str:
+    '''
+    Returns a directory with a given number of `folders`,
+    each one with a Quantum ESPRESSO input and output of a given `size` name,
+    as expected by `thoth.qe.read_dirs()`.
+    '''
+    directory = _path(f'dirs_{folders}_{size}')
+    if os.path.isdir(directory):
+        return directory
+    template = qe_out(None, size)
+    with open(template) as f:
+        output = f.read()
+    temp_directory = directory + '.tmp'
+    for i in range(folders):
+        folder = os.path.join(temp_directory, f'relax_{i:06d}')
+        os.makedirs(folder, exist_ok=True)
+        qe_in(os.path.join(folder, 'relax.in'), 40.0 + i)
+        with open(os.path.join(folder, 'relax.out'), 'w') as f:
+            f.write(output)
+    os.replace(temp_directory, directory)
+    return directory
+
+
+def _path(name:str) -> str:
+    '''
+    Returns the path of a file with the given `name` inside the data folder.
+    '''
+    os.makedirs(DATA, exist_ok=True)
+    return os.path.join(DATA, name)
@@ -0,0 +1,275 @@
+'''
+# Description
+Runs the benchmarks without asv, saving the results as JSON,
+and compares the results of different versions of Thoth.
+
+Each benchmark runs in a separate process, recording its wall time,
+the throughput in MB/s when the benchmark reads a file,
+the value of `track_` benchmarks (MB/s, files/s), and the peak RSS of the process.
+
+# Usage
+Run all benchmarks, or only those containing a given string, saving the results to a JSON file:
+```bash
+python3 -m benchmarks.run -o results.json
+python3 -m benchmarks.run -b find_pos -o results.json
+```
+Compare two JSON files with previous results:
+```bash
+python3 -m benchmarks.run --compare old.json new.json
+```
+Run the benchmarks over two git commits and compare them:
+```bash
+python3 -m benchmarks.run --commits v4.3.7 HEAD -b text
+```
+
+---
+'''
+
+
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+MODULES = ['bench_text', 'bench_qe', 'bench_import']
+'''Modules containing the benchmarks.'''
+
+PREFIXES = ('time_', 'peakmem_', 'track_')
+'''Prefixes of the benchmark methods, as in asv.'''
+
+THRESHOLD = 1.1
+'''Min ratio between two results to be reported as a change when comparing.'''
+
+
+def discover(pattern:str=None) -> list:
+    '''
+    Returns a list with all the benchmarks as `(module, class, method, params)`,
+    optionally filtered by a `pattern` string contained in their name.
+    '''
+    benchmarks = []
+    for module_name in MODULES:
+        module = importlib.import_module(f'benchmarks.{module_name}')
+        for class_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            params = getattr(cls, 'params', [])
+            if params and not isinstance(params[0], (list, tuple)):
+                params = [params]
+            for method in sorted(vars(cls)):
+                if not method.startswith(PREFIXES):
+                    continue
+                for combination in itertools.product(*params):
+                    benchmark = (module_name, class_name, method, list(combination))
+                    if pattern and pattern not in name(benchmark):
+                        continue
+                    benchmarks.append(benchmark)
+    return benchmarks
+
+
+def name(benchmark) -> str:
+    '''
+    Returns the full name of a `benchmark`.
+    '''
+    module_name, class_name, method, params = benchmark
+    return f'{module_name}.{class_name}.{method}({", ".join(str(p) for p in params)})'
+
+
+def run_single(module_name:str, class_name:str, method:str, params:list) -> dict:
+    '''
+    Runs a single benchmark in the current process, returning a dict with the results.
+    '''
+    module = importlib.import_module(f'benchmarks.{module_name}')
+    cls = getattr(module, class_name)
+    instance = cls()
+    function = getattr(instance, method)
+    result = {}
+    setup = getattr(instance, 'setup', lambda *args: None)
+    teardown = getattr(instance, 'teardown', lambda *args: None)
+    try:
+        setup(*params)
+    except NotImplementedError as error:
+        return {'skipped': str(error)}
+    try:
+        if method.startswith('track_'):
+            result['value'] = function(*params)
+            result['unit'] = getattr(function, 'unit', '')
+        elif method.startswith('peakmem_'):
+            function(*params)
+        else:
+            number = getattr(cls, 'number', 0)
+            repeat = getattr(cls, 'repeat', 5)
+            if not number:  # Calibrate to get samples of at least 10 ms
+                number = 1
+                while number < 10000 and _sample(function, params, number) < 0.01:
+                    number *= 2
+            samples = []
+            for i in range(repeat):
+                if i and getattr(cls, 'number', 0) == 1:
+                    teardown(*params)
+                    setup(*params)
+                samples.append(_sample(function, params, number) / number)
+            result['time'] = min(samples)
+            size_bytes = getattr(instance, 'size_bytes', None)
+            if size_bytes:
+                result['MB/s'] = size_bytes / 1e6 / result['time']
+    finally:
+        teardown(*params)
+    result['peak_rss_MB'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def _sample(function, params:list, number:int) -> float:
+    '''
+    Returns the seconds spent calling `function` with `params` a given `number` of times.
+    '''
+    start = time.perf_counter()
+    for _ in range(number):
+        function(*params)
+    return time.perf_counter() - start
+
+
+def run(pattern:str=None, cwd:str=None, env:dict=None) -> dict:
+    '''
+    Runs all the benchmarks matching a `pattern`, each one in a new process,
+    from the `cwd` folder and with an optional `env`.
+    Returns a dict with the results of each benchmark.
+    '''
+    results = {}
+    for benchmark in discover(pattern):
+        command = [sys.executable, '-m', 'benchmarks.run', '--single', json.dumps(benchmark)]
+        process = subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if process.returncode == 0:
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+        else:
+            error = process.stderr.strip().splitlines()
+            result = {'error': error[-1] if error else f'Exit code {process.returncode}'}
+        results[name(benchmark)] = result
+        print(f'{name(benchmark):<70} {_format(result)}')
+    return results
+
+
+def run_commits(commits:list, pattern:str=None) -> list:
+    '''
+    Runs the current benchmarks over the Thoth version of each git commit in `commits`,
+    using temporary git worktrees. Returns a list with the results of each commit.
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    all_results = []
+    with tempfile.TemporaryDirectory() as temp:
+        # Copy the current benchmarks, so that all commits run the same ones
+        bench_root = os.path.join(temp, 'bench')
+        shutil.copytree(os.path.join(root, 'benchmarks'), os.path.join(bench_root, 'benchmarks'),
+                        ignore=shutil.ignore_patterns('__pycache__'))
+        for i, commit in enumerate(commits):
+            worktree = os.path.join(temp, f'worktree_{i}')
+            subprocess.run(['git', 'worktree', 'add', '--detach', worktree, commit], cwd=root, check=True)
+            try:
+                print(f'Running benchmarks on {commit} ...')
+                env = dict(os.environ, PYTHONPATH=worktree)
+                results = run(pattern, cwd=bench_root, env=env)
+                all_results.append({'commit': commit, 'results': results})
+            finally:
+                subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=root)
+    return all_results
+
+
+def compare(old:dict, new:dict) -> None:
+    '''
+    Prints a comparison report between the `old` and `new` results.
+    Times, memory usages and other tracked values are compared as new/old,
+    and throughputs (units per second) as old/new, so that ratios above 1 are always regressions.
+    '''
+    print(f'{"Benchmark":<70} {"Metric":<12} {"Old":>12} {"New":>12} {"Ratio":>7}')
+    changes = {'regressions': 0, 'improvements': 0}
+    for benchmark in sorted(set(old['results']) & set(new['results'])):
+        old_result = old['results'][benchmark]
+        new_result = new['results'][benchmark]
+        for metric in ('time', 'MB/s', 'value', 'peak_rss_MB'):
+            if metric not in old_result or metric not in new_result:
+                continue
+            a, b = old_result[metric], new_result[metric]
+            if not a or not b:
+                continue
+            unit = old_result.get('unit', '')
+            higher_is_better = metric == 'MB/s' or (metric == 'value' and unit.endswith('/s'))
+            ratio = a / b if higher_is_better else b / a
+            flag = ''
+            if ratio > THRESHOLD:
+                flag = ' slower' if metric != 'peak_rss_MB' else ' more memory'
+                changes['regressions'] += 1
+            elif ratio < 1 / THRESHOLD:
+                flag = ' faster' if metric != 'peak_rss_MB' else ' less memory'
+                changes['improvements'] += 1
+            label = (unit or 'value') if metric == 'value' else metric
+            print(f'{benchmark:<70} {label:<12} {a:>12.4g} {b:>12.4g} {ratio:>7.2f}{flag}')
+    print(f'{changes["regressions"]} regressions and {changes["improvements"]} improvements '
+          f'of more than {int((THRESHOLD - 1) * 100)}% between {old.get("commit")} and {new.get("commit")}')
+
+
+def _format(result:dict) -> str:
+    '''
+    Formats a benchmark `result` in a single line.
+    '''
+    if 'error' in result:
+        return f'ERROR: {result["error"]}'
+    if 'skipped' in result:
+        return f'Skipped: {result["skipped"]}'
+    parts = []
+    if 'time' in result:
+        parts.append(f'{result["time"] * 1000:10.3f} ms')
+    if 'MB/s' in result:
+        parts.append(f'{result["MB/s"]:9.1f} MB/s')
+    if 'value' in result:
+        parts.append(f'{result["value"]:9.1f} {result.get("unit", "")}')
+    parts.append(f'{result["peak_rss_MB"]:7.1f} MB peak RSS')
+    return '  '.join(parts)
+
+
+def _commit(cwd:str=None) -> str:
+    '''
+    Returns the current git commit, if any.
+    '''
+    process = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return process.stdout.strip() or None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run the Thoth benchmarks.')
+    parser.add_argument('-b', '--bench', help='Only run benchmarks containing this string')
+    parser.add_argument('-o', '--output', help='Save the results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two JSON files with results')
+    parser.add_argument('--commits', nargs=2, metavar=('OLD', 'NEW'), help='Run and compare two git commits')
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.single:
+        print(json.dumps(run_single(*json.loads(args.single))))
+        return
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        compare(old, new)
+        return
+    if args.commits:
+        old, new = run_commits(args.commits, args.bench)
+        outputs = [old, new]
+        compare(old, new)
+    else:
+        outputs = {'commit': _commit(), 'results': run(args.bench)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(outputs, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@ fix_dict ={
     '[extract](https://pablogila.github.io/Thoth/thoth/extract.html)'   : '`thoth.extract`',
     '[alias](https://pablogila.github.io/Thoth/thoth/alias.html)'       : '`thoth.alias`',
     '[call](https://pablogila.github.io/Thoth/thoth/call.html)'         : '`thoth.call`',
+    '[profile](https://pablogila.github.io/Thoth/thoth/profile.html)'   : '`thoth.profile`',
     '[qe](https://pablogila.github.io/Thoth/thoth/call.html)'           : '`thoth.qe`',
     '[common](https://pablogila.github.io/Thoth/thoth/common.html)'     : '`thoth.common`',
     '[phonopy](https://pablogila.github.io/Thoth/thoth/phonopy.html)'   : '`thoth.phonopy`',
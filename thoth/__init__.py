@@ -4,11 +4,30 @@
 
 
 from .common import *
-from . import alias
-from . import file
-from . import call
-from . import text
-from . import extract
-from . import qe
-from . import phonopy
+import os as _os
+from importlib import import_module as _import_module
+
+
+_submodules = ['alias', 'file', 'call', 'text', 'extract', 'qe', 'phonopy', 'profile']
+'''
+Submodules, imported on first access as `thoth.text`,
+so that scripts only pay for the modules they use, and pandas is not imported unless needed.
+'''
+
+__all__ = ['version', *_submodules]
+'''Names exported by `from thoth import *`, importing the submodules through `__getattr__()`.'''
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return _import_module('.' + name, __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + _submodules)
+
+
+if _os.environ.get('THOTH_PROFILE'):
+    from . import profile
 
@@ -4,6 +4,7 @@ Functions to simplify calling bash scripts and related.
 
 # Index
 - `shell()`
+- `batch()`
 - `git()`
 - `here()`
 
@@ -13,6 +14,7 @@ Functions to simplify calling bash scripts and related.
 
 import subprocess
 import datetime
+import signal
 import sys
 import os
 from .common import *
@@ -29,6 +31,103 @@ def shell(command, cwd=None):
     return result
 
 
+def batch(jobs:list, workers:int=None, timeout:float=None, retries:int=0, check:bool=False, callback=None) -> list:
+    '''
+    Run a list of shell commands concurrently, with up to `workers` running at the same time.
+    Each job can be a `command` string, a `(command, cwd)` tuple, or a `(command, cwd, env)` tuple,
+    where `env` is a dict of environment variables added to the current ones.
+    By default, as many `workers` as CPUs are used.
+    Commands running for longer than `timeout` seconds are killed,
+    and failed or killed commands are run again up to `retries` times.
+    An optional `callback(index, result)` is called as soon as each job finishes.
+    Returns a list with the `subprocess.CompletedProcess` of each job, in the same order as `jobs`.
+    Each result also stores the number of `attempts`;
+    killed jobs have a negative `returncode` and `timed_out=True`.
+    Jobs that cannot be started, for example because their `cwd` does not exist,
+    do not stop the rest: their result has `returncode=1`, and the exception is stored as `error`,
+    which is `None` for the jobs that started.
+    If `check=True`, a RuntimeError is raised after all jobs finish if any of them failed.
+    '''
+    import asyncio
+    jobs = [_to_job(job) for job in jobs]
+    workers = workers or os.cpu_count() or 1
+    coroutine = _batch(jobs, workers, timeout, retries, callback)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        results = asyncio.run(coroutine)
+    else:  # Already inside an event loop, such as in a Jupyter notebook
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(1) as executor:
+            results = executor.submit(asyncio.run, coroutine).result()
+    failed = [result for result in results if result.returncode != 0]
+    if check and failed:
+        commands = '\n'.join(f'  [{result.returncode}] {result.args}' for result in failed)
+        raise RuntimeError(f"{len(failed)} of {len(results)} commands failed:\n{commands}")
+    return results
+
+
+def _to_job(job) -> tuple:
+    '''Normalizes a `job` of `batch()` to a `(command, cwd, env)` tuple.'''
+    if isinstance(job, str):
+        return job, None, None
+    job = tuple(job)
+    if len(job) == 2:
+        return job[0], job[1], None
+    return job[0], job[1], job[2]
+
+
+async def _batch(jobs:list, workers:int, timeout:float, retries:int, callback) -> list:
+    '''Runs all `jobs` limited by a semaphore of `workers`, see `batch()`.'''
+    import asyncio
+    semaphore = asyncio.Semaphore(workers)
+    async def run(index:int, job:tuple):
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    result = await _run(*job, timeout)
+                except Exception as error:
+                    result = subprocess.CompletedProcess(job[0], 1, b'', str(error).encode())
+                    result.timed_out = False
+                    result.error = error
+                if result.returncode == 0:
+                    break
+        result.attempts = attempt + 1
+        print('>>>  ' + job[0])
+        if callback:
+            callback(index, result)
+        return result
+    return await asyncio.gather(*(run(index, job) for index, job in enumerate(jobs)))
+
+
+async def _run(command:str, cwd, env:dict, timeout:float) -> subprocess.CompletedProcess:
+    '''Runs a single shell `command`, killing it and its children after `timeout` seconds.'''
+    import asyncio
+    if env:
+        env = {**os.environ, **{key: str(value) for key, value in env.items()}}
+    posix = os.name == 'posix'
+    process = await asyncio.create_subprocess_shell(
+        command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        start_new_session=posix)
+    timed_out = False
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        try:
+            if posix:
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+        stdout, stderr = await process.communicate()
+    result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+    result.timed_out = timed_out
+    result.error = None
+    return result
+
+
 def git(path=None) -> None:
     '''Update'''
     if path:
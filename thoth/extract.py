@@ -4,14 +4,24 @@ Functions to extract data from raw text strings.
 
 # Index
 - `number()`
+- `numbers()`
 - `string()`
 - `column()`
 
+The regular expressions are compiled once per `name` and cached,
+so these functions can be called over many lines and files at a low cost.
+The names are searched literally, so they can contain spaces or regex metacharacters.
+
 ---
 '''
 
 
 import re
+from functools import lru_cache
+
+
+_NUMBER = r"(-?\d+(?:\.\d+)?(?:[eEdD][+\-]?\d+)?)"
+'''Regular expression of a number, including Fortran `D` exponents.'''
 
 
 def number(text:str, name:str='') -> float:
@@ -26,12 +36,38 @@ def number(text:str, name:str='') -> float:
     '''
     if text == None:
         return None
-    pattern = re.compile(rf"{name}\s*[:=]?\s*(-?\d+(?:\.\d+)?(?:[eEdD][+\-]?\d+)?)")
-    match = pattern.search(text)
+    match = _number_pattern(name).search(text)
     if match:
-        return float(match.group(1))
+        return _to_float(match.group(1))
     return None
-    
+
+
+def numbers(text:str, names:list) -> dict:
+    '''
+    Extracts the float values of several `names` from a raw `text` at once,
+    scanning the text a single time.
+    Returns a dict with the first value found for each name, or `None` if it was not found.\n
+    Example:
+    ```python
+    >>> text = 'Total force =  0.0021  Total SCF correction =  0.0001'
+    >>> thoth.extract.numbers(text, ['Total force', 'Total SCF correction'])
+    {'Total force': 0.0021, 'Total SCF correction': 0.0001}
+    ```
+    '''
+    values = dict.fromkeys(names)
+    if text == None:
+        return values
+    pattern, group_names = _numbers_pattern(tuple(names))
+    remaining = len(values)
+    for match in pattern.finditer(text):
+        name = group_names[match.lastindex - 1]
+        if values[name] is None:
+            values[name] = _to_float(match.group(match.lastindex))
+            remaining -= 1
+            if remaining == 0:
+                break
+    return values
+
 
 def string(text:str, name:str='', stop:str='', strip:bool=False) -> str:
     '''
@@ -45,10 +81,7 @@ def string(text:str, name:str='', stop:str='', strip:bool=False) -> str:
     '500.0 Ry'  # String output
     ```
     '''
-    pattern = re.compile(rf"{name}\s*[:=]?\s*(.*)")
-    if stop:
-        pattern = re.compile(rf"{name}\s*[:=]?\s*(.*)(?={stop})")
-    match = re.search(pattern, text)
+    match = _string_pattern(name, stop if stop else '').search(text)
     if not match:
         return None
     result = str(match.group(1))
@@ -67,10 +100,49 @@ def column(text:str, column:int) -> float:
     if text is None:
         return None
     columns = text.split()
-    pattern = r'(-?\d+(?:\.\d+)?(?:[eE][+\-]?\d+)?)'
     if column < len(columns):
-        match = re.match(pattern, columns[column])
+        match = _column_pattern.match(columns[column])
         if match:
             return float(match.group(1))
     return None
 
+
+_column_pattern = re.compile(r'(-?\d+(?:\.\d+)?(?:[eE][+\-]?\d+)?)')
+'''Regular expression used by `column()`.'''
+
+
+@lru_cache(maxsize=1024)
+def _number_pattern(name:str):
+    '''
+    Returns the compiled regular expression used by `number()` for a given `name`.
+    '''
+    return re.compile(rf"{re.escape(name)}\s*[:=]?\s*{_NUMBER}")
+
+
+@lru_cache(maxsize=256)
+def _numbers_pattern(names:tuple):
+    '''
+    Returns a compiled regular expression to find all `names` used by `numbers()`,
+    along with the name corresponding to each capturing group.
+    Longer names are tried first, so that names containing other names are matched properly.
+    '''
+    sorted_names = sorted(set(names), key=len, reverse=True)
+    alternatives = [rf"{re.escape(name)}\s*[:=]?\s*{_NUMBER}" for name in sorted_names]
+    return re.compile('|'.join(alternatives)), sorted_names
+
+
+@lru_cache(maxsize=1024)
+def _string_pattern(name:str, stop:str=''):
+    '''
+    Returns the compiled regular expression used by `string()` for a given `name` and `stop`.
+    '''
+    if stop:
+        return re.compile(rf"{re.escape(name)}\s*[:=]?\s*(.*)(?={re.escape(stop)})")
+    return re.compile(rf"{re.escape(name)}\s*[:=]?\s*(.*)")
+
+
+def _to_float(value:str) -> float:
+    '''
+    Converts a `value` string to float, including Fortran `D` exponents.
+    '''
+    return float(value.replace('d', 'e').replace('D', 'e'))
@@ -5,6 +5,8 @@ Functions to manipulate files.
 # Index
 - `get()`
 - `get_list()`
+- `walk()`
+- `clear_cache()`
 - `copy()`
 - `move()`
 - `remove()`
@@ -12,13 +14,36 @@ Functions to manipulate files.
 - `rename_on_subfolders()`
 - `copy_to_subfolders()`
 - `from_template()`
+- `Template`
 
 ---
 '''
 
 
 import os
+import re
 import shutil
+import stat
+import time
+import fnmatch
+import itertools
+
+
+cache_ttl = 0
+'''
+Seconds to keep the directory listings in memory, shared by `get()`, `get_list()`, `walk()`
+and the functions that use them, such as the readers of `thoth.qe`.
+Set it to a positive value to avoid listing the same folders again,
+which is much faster on network filesystems such as Lustre or NFS.
+Files created or removed during this time may be missed; use `clear_cache()` to refresh the listings.
+By default the listings are not cached.
+'''
+
+syscalls = {'scandir': 0, 'stat': 0}
+'''
+Number of metadata system calls performed by this module, to verify the effect of `cache_ttl`.
+Reset it with `thoth.file.syscalls.update(scandir=0, stat=0)`.
+'''
 
 
 def get(file:str, filters=None) -> str:
@@ -31,18 +56,21 @@ def get(file:str, filters=None) -> str:
     if there are more files, it tries to filter them with the `filters` keyword(s) to return a single file.
     If this fails, try using more strict filers to return a single file.
     '''
-    if os.path.isfile(file):
-        return os.path.abspath(file)
-    elif os.path.isdir(file):
-        files = get_list(file, filters, abspath=True)
-    else:
+    folder = os.path.abspath(file)
+    try:
+        entries = _listing(folder)
+    except FileNotFoundError:
         raise FileNotFoundError('Nothing found at ' + file)
+    if entries is None:
+        return folder
+    files = _filter([entry[0] for entry in entries], filters)
     # Return a single file
     if len(files) == 1:
-        return files[0]
+        return os.path.join(folder, files[0])
     elif len(files) == 0:
         raise FileNotFoundError('The following directory is empty (maybe due to the filters):' + file)
     else:
+        files = [os.path.join(folder, f) for f in files]
         raise FileExistsError(f'More than one file found, please apply a more strict filter. Found:\n{files}')
 
 
@@ -51,30 +79,131 @@ def get_list(folder:str, filters=None, abspath:bool=True) -> list:
     Takes a `folder`, filters the content with the `filters` keyword(s) if provided, and returns a list with the matches.
     The full paths are returned by default; to get only the base names, set `abspath=False`.
     '''
-    if os.path.isfile(folder):
-        folder = os.path.dirname(folder)
-    if not os.path.isdir(folder):
+    path = os.path.abspath(folder)
+    try:
+        entries = _listing(path)
+        if entries is None:
+            path = os.path.dirname(path)
+            entries = _listing(path)
+    except FileNotFoundError:
         raise FileNotFoundError('Nothing found at ' + folder)
-    folder = os.path.abspath(folder)
-    files = os.listdir(folder)
-    # Apply filters or not
-    if filters is not None:
-        target_files = []
-        if not isinstance(filters, list):
-            filters = [str(filters)]
-        for filter_i in filters:
-            for f in files:
-                if filter_i in f:
-                    target_files.append(f)
-        files = target_files
+    files = _filter([entry[0] for entry in entries], filters)
     if abspath:
-        filepaths = []
-        for f in files:
-            filepaths.append(os.path.join(folder, f))
-        files = filepaths
+        files = [os.path.join(path, f) for f in files]
     return files
 
 
+def walk(folder:str,
+         glob:str=None,
+         regex:str=None,
+         extension=None,
+         recursive:bool=True,
+         files:bool=True,
+         dirs:bool=False,
+         abspath:bool=True) -> list:
+    '''
+    Returns a sorted list with the files inside a `folder` and all its subfolders.
+    Set `recursive=False` to search only inside the `folder`.
+    Directories are also returned with `dirs=True`, and files are omitted with `files=False`.
+    The results can be filtered with a `glob` pattern of the name, such as `'*.in'`,
+    a `regex` searched in the path relative to the `folder`, and an `extension` or list of extensions.
+    The full paths are returned by default; to get the paths relative to the `folder`, set `abspath=False`.
+    The types of the entries are taken from the directory listing,
+    so no additional system calls are needed for each file.
+    Symbolic links to directories are not followed.
+    '''
+    root = os.path.abspath(folder)
+    glob = re.compile(fnmatch.translate(glob)).match if glob else None
+    regex = re.compile(regex).search if regex else None
+    if isinstance(extension, list):
+        extension = tuple(extension)
+    results = []
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        try:
+            entries = _listing(os.path.join(root, relative))
+        except FileNotFoundError:
+            if relative:
+                continue
+            raise FileNotFoundError('Nothing found at ' + folder)
+        if entries is None:
+            if relative:
+                continue
+            raise NotADirectoryError('Not a directory: ' + folder)
+        for name, is_dir, is_file, is_link in entries:
+            path = os.path.join(relative, name)
+            if is_dir and recursive and not is_link:
+                pending.append(path)
+            if not ((files and is_file) or (dirs and is_dir)):
+                continue
+            if glob and not glob(name):
+                continue
+            if extension and not name.endswith(extension):
+                continue
+            if regex and not regex(path):
+                continue
+            results.append(path)
+    results.sort()
+    if abspath:
+        results = [os.path.join(root, path) for path in results]
+    return results
+
+
+def clear_cache() -> None:
+    '''
+    Removes the directory listings stored in memory, see `cache_ttl`.
+    '''
+    _listings.clear()
+    return None
+
+
+def _listing(folder:str):
+    '''
+    Returns the entries of an absolute `folder` path as a list of `(name, is_dir, is_file, is_link)` tuples,
+    or `None` if it is not a directory. Listings are reused for `cache_ttl` seconds.
+    Raises FileNotFoundError if nothing exists at the given path.
+    '''
+    if cache_ttl:
+        cached = _listings.get(folder)
+        if cached is not None and time.monotonic() - cached[0] < cache_ttl:
+            return cached[1]
+    syscalls['scandir'] += 1
+    try:
+        with os.scandir(folder) as iterator:
+            entries = []
+            for entry in iterator:
+                is_link = entry.is_symlink()
+                if is_link:  # Following the link requires a stat
+                    syscalls['stat'] += 1
+                entries.append((entry.name, entry.is_dir(), entry.is_file(), is_link))
+    except NotADirectoryError:
+        entries = None
+    if cache_ttl:
+        _listings[folder] = (time.monotonic(), entries)
+    return entries
+
+
+def _filter(files:list, filters=None) -> list:
+    '''
+    Returns the `files` that contain any of the `filters` keyword(s).
+    '''
+    if filters is None:
+        return files
+    target_files = []
+    if not isinstance(filters, list):
+        filters = [str(filters)]
+    for filter_i in filters:
+        for f in files:
+            if filter_i in f:
+                target_files.append(f)
+    return target_files
+
+
+_listings = {}
+'''Directory listings as `{folder: (time, entries)}`, see `cache_ttl` and `_listing()`.'''
+
+
 def copy(original_file:str, new_file:str) -> None:
     '''
     Copies the content of `original_file` to `new_file` with shutil,
@@ -177,20 +306,149 @@ def copy_to_subfolders(folder=None, extension:str=None, strings_to_delete:list=[
 def from_template(template:str, new_file:str, comment:str=None, fixing_dict:dict=None) -> None:
     '''
     Same as `copy_file`, but optionally adds a `comment` at the beginning of the new file.
-    Also, it optionally corrects the output file with a `fixing_dict` dictionary.
+    Also, it optionally corrects the output file with a `fixing_dict` dictionary,
+    replacing each key in order, so that the following keys also apply to the values of the previous ones.
+    The template is read and the new file is written only once, as bytes, without translating newlines;
+    see `Template` to generate many files from the same template.
     '''
-    copy(template, new_file)
+    template_path = get(template)
+    if not comment and not fixing_dict:
+        copy(template_path, new_file)
+        return None
+    if os.path.isdir(new_file):
+        new_file = os.path.join(new_file, os.path.basename(template_path))
+    with open(template_path, 'rb') as f:
+        content = f.read()
     if comment:
-        with open(new_file, 'r+') as f:
-            content = f.read()
-            f.seek(0)
-            f.write(comment + '\n' + content)
+        content = comment.encode() + b'\n' + content
     if fixing_dict:
-        with open(new_file, 'r+') as f:
-            content = f.read()
-            for key, value in fixing_dict.items():
-                content = content.replace(key, value)
-            f.seek(0)
-            f.write(content)
+        for key, value in fixing_dict.items():
+            content = content.replace(key.encode(), str(value).encode())
+    with open(new_file, 'wb') as f:
+        f.write(content)
+    shutil.copymode(template_path, new_file)
     return None
 
+
+class Template:
+    '''
+    Template file to generate many files quickly.
+    The `template` is read only once, and split into literal text and slots
+    for the keys to replace, so that each new file is rendered with a single join.
+    Usage example:
+    ```python
+    template = thoth.file.Template('relax.in')
+    template.write('relax_1.in', {'ECUT': 60})
+    template.sweep('calcs', {'ECUT': [40, 50, 60], 'KPTS': ['2 2 2', '4 4 4']})
+    ```
+    Keys are literal strings, as in `from_template()`.
+    Unlike `from_template()`, all keys are replaced at once, the longest one first when they overlap,
+    so the new values are never replaced again by other keys.
+    Newlines are kept as in the template.
+    '''
+    def __init__(self, template:str):
+        self.file = get(template)
+        '''Full path of the template file.'''
+        with open(self.file, 'r', newline='') as f:
+            text = f.read()
+        self.text = text
+        '''Content of the template.'''
+        self.mode = stat.S_IMODE(os.stat(self.file).st_mode)
+        '''Permissions of the template, applied to the new files.'''
+        self._segments = {}
+
+    def render(self, values:dict=None, comment:str=None) -> str:
+        '''
+        Returns the content of the template, replacing the keys of the `values` dict by their values.
+        Optionally adds a `comment` line at the beginning.
+        '''
+        text = self.text
+        if values:
+            keys = tuple(sorted((key for key in values if key), key=len, reverse=True))
+            segments = self._segments.get(keys)
+            if segments is None:
+                segments = self._split(keys)
+            literals, slots = segments
+            parts = [literals[0]]
+            for key, literal in zip(slots, literals[1:]):
+                parts.append(str(values[key]))
+                parts.append(literal)
+            text = ''.join(parts)
+        if comment:
+            text = comment + '\n' + text
+        return text
+
+    def write(self, new_file:str, values:dict=None, comment:str=None) -> str:
+        '''
+        Writes the template to `new_file`, replacing the keys of the `values` dict.
+        Optionally adds a `comment` at the beginning of the file.
+        Returns the path of the new file.
+        '''
+        text = self.render(values, comment)
+        fd = os.open(new_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self.mode)
+        with open(fd, 'w', newline='') as f:
+            f.write(text)
+        return new_file
+
+    def sweep(self,
+              folder:str,
+              values,
+              filename:str=None,
+              name:str=None,
+              comment:str=None,
+              workers:int=None) -> list:
+        '''
+        Writes a new file for each point of a parameter sweep, each one inside its own subfolder of `folder`.
+        The sweep `values` can be a dict with lists of values for each key, to write all their combinations,
+        or a list of dicts with the values for each point.
+        The files are named as the template unless a `filename` is provided.
+        Subfolders are named after the template and the number of the point, starting from 1,
+        such as 'relax_001', as expected by `thoth.qe.read_dirs()`.
+        A custom `name` can be formatted with the `{index}` of the point and its values,
+        as in `name='relax_{index}_{ECUT}'`; `{index}` is always the number of the point,
+        even if the point has an `'index'` key.
+        An optional `comment` is added at the beginning of every file.
+        The files are written in parallel by a pool of `workers` threads.
+        Returns a list with the paths of the new files.
+        '''
+        if isinstance(values, dict):
+            keys = list(values)
+            points = [dict(zip(keys, point)) for point in itertools.product(*values.values())]
+        else:
+            points = list(values)
+        if not filename:
+            filename = os.path.basename(self.file)
+        if not name:
+            width = max(3, len(str(len(points))))
+            name = os.path.splitext(filename)[0] + '_{index:0' + str(width) + 'd}'
+        new_files = []
+        for index, point in enumerate(points, 1):
+            subfolder = os.path.join(folder, name.format_map({**point, 'index': index}))
+            new_files.append(os.path.join(subfolder, filename))
+        # Compile the template once before writing
+        if points:
+            self.render(points[0])
+        def write_point(new_file, point):
+            os.makedirs(os.path.dirname(new_file), exist_ok=True)
+            return self.write(new_file, point, comment)
+        from concurrent.futures import ThreadPoolExecutor
+        workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(write_point, new_files, points))
+
+    def _split(self, keys:tuple) -> tuple:
+        '''
+        Splits the template into a list of literal strings and a list with the keys between them.
+        '''
+        pattern = re.compile('|'.join(re.escape(key) for key in keys))
+        literals = []
+        slots = []
+        pos = 0
+        for match in pattern.finditer(self.text):
+            literals.append(self.text[pos:match.start()])
+            slots.append(match.group())
+            pos = match.end()
+        literals.append(self.text[pos:])
+        segments = (literals, slots)
+        self._segments[keys] = segments
+        return segments
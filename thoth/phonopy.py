@@ -3,8 +3,527 @@
 Functions to work with [Phonopy](https://phonopy.github.io/phonopy/) calculations, along with [Quantum ESPRESSO](https://www.quantum-espresso.org/).
 
 # Index
-Under construction, currently porting [PhonoMake](https://github.com/pablogila/phonomake) bash scripts...
+- `read_disp()`
+- `write_supercells()`
+- `read_forces()`
+- `write_force_sets()`
+- `read_yaml()`
+- `Phonons`
 
 ---
 '''
 
+
+import os
+import re
+import mmap
+import tempfile
+import numpy as np
+from itertools import repeat
+from .file import get, walk
+from .text import find, _compression
+from .qe import parse_in, _cards, _read_nat, _read_block
+
+
+def read_disp(file='phonopy_disp.yaml') -> dict:
+    '''
+    Reads the supercell and the displacements of a `phonopy_disp.yaml` file,
+    returning a dict with the following keys:
+    `'lattice'` (3 × 3 array with the lattice vectors as rows), `'symbols'` (list),
+    `'positions'` (atoms × 3 array of crystal coordinates), `'masses'` (array),
+    `'atoms'` (array with the index of the displaced atom, starting from 0),
+    `'displacements'` (displacements × 3 array of cartesian vectors),
+    and `'unit'`, the length unit of the lattice and displacements, `'au'` or `'angstrom'`.
+    The file is scanned with mmap and regular expressions,
+    relying on the fixed layout written by Phonopy, so it is much faster than a full YAML parser.
+    '''
+    file = get(file)
+    with open(file, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            unit = _disp_unit.search(mm)
+            unit = unit.group(1).decode().lower() if unit else 'angstrom'
+            supercell = _section(mm, b'supercell')
+            displacements = _section(mm, b'displacements')
+    if supercell is None:
+        raise ValueError(f'Supercell not found in {file}')
+    lattice_start = supercell.find(b'lattice:')
+    points_start = supercell.find(b'points:')
+    lattice = _to_array(_disp_row.findall(supercell, lattice_start, points_start)[:3], 3)
+    points = _disp_point.findall(supercell, points_start)
+    if lattice.shape != (3, 3) or not points:
+        raise ValueError(f'Unexpected supercell format in {file}')
+    moves = _disp_move.findall(displacements) if displacements is not None else []
+    return {
+        'lattice': lattice,
+        'symbols': [point[0].decode() for point in points],
+        'positions': _to_array([point[1] for point in points], 3),
+        'masses': np.array([float(point[2]) if point[2] else np.nan for point in points]),
+        'atoms': np.array([int(move[0]) - 1 for move in moves], dtype=int),
+        'displacements': _to_array([move[1] for move in moves], 3),
+        'unit': unit,
+    }
+
+
+_disp_unit = re.compile(rb'\n\s+length:\s*"?([A-Za-z]+)')
+'''Length unit of a `phonopy_disp.yaml` file.'''
+
+_disp_row = re.compile(rb'-\s*\[([^\]]*)\]')
+'''Row of a YAML matrix, such as `- [ 1.0, 0.0, 0.0 ] # a`.'''
+
+_disp_point = re.compile(rb'- symbol:\s*(\S+)[^\n]*\n\s*coordinates:\s*\[([^\]]*)\](?:\s*\n\s*mass:\s*(\S+))?')
+'''Atom of a cell, with its symbol, crystal coordinates and optional mass.'''
+
+_disp_move = re.compile(rb'- atom:\s*(\d+)\s*\n\s*displacement:\s*\[([^\]]*)\]')
+'''Displacement of an atom, starting from 1, and its cartesian vector.'''
+
+
+def _section(mm, name:bytes):
+    '''
+    Returns the bytes of a top-level section of a YAML memory map `mm`,
+    from the line after `name:` until the next top-level key, or `None` if not found.
+    '''
+    start = mm.find(b'\n' + name + b':\n')
+    if start == -1:
+        return None
+    start += len(name) + 3
+    end = _top_level_key.search(mm, start - 1)
+    return mm[start:end.start() + 1 if end else len(mm)]
+
+
+_top_level_key = re.compile(rb'\n[^\s#-]')
+'''Start of a top-level key of a YAML file.'''
+
+
+def _to_array(rows:list, columns:int):
+    '''
+    Converts a list of bytes `rows` with comma-separated numbers to a NumPy array with the given `columns`,
+    parsing all the values at once.
+    '''
+    if not rows:
+        return np.empty((0, columns))
+    values = b','.join(rows).split(b',')
+    return np.array(values, dtype=float).reshape(-1, columns)
+
+
+def write_supercells(template,
+                     source='phonopy_disp.yaml',
+                     folder:str=None,
+                     name:str='supercell',
+                     workers:int=None) -> list:
+    '''
+    Writes the Quantum ESPRESSO inputs of all the displaced supercells of a Phonopy calculation,
+    each one inside its own subfolder, such as `supercell-001/supercell-001.in`.\n
+    The namelists and cards are taken from the `template` input file, read with `thoth.qe.parse_in()`,
+    setting `ibrav = 0` and the number of atoms `nat` of the supercell.
+    The displacements are read from the `source`, which can be a `phonopy_disp.yaml` file,
+    or a folder with the `supercell-XXX.in` files written by `phonopy --qe -d`.
+    With a `phonopy_disp.yaml` file, the `CELL_PARAMETERS` and `ATOMIC_POSITIONS` are built from the supercell,
+    and the `ATOMIC_SPECIES` are taken from the template.
+    With `supercell-XXX.in` files, their cards replace the cards of the template with the same name.\n
+    The files are written in the `folder` of the `source` unless another `folder` is specified,
+    with subfolders named after the `name` and the number of the displacement.
+    The atomic positions of the supercell are formatted only once,
+    and each file only changes the line of the displaced atom,
+    so that supercells with thousands of atoms and displacements are written quickly,
+    in parallel by a pool of `workers` threads.
+    Returns a list with the paths of the new files.
+    '''
+    template = get(template)
+    source = os.path.abspath(source)
+    if folder is None:
+        folder = source if os.path.isdir(source) else os.path.dirname(source)
+    if os.path.isdir(source):
+        files = sorted(walk(source, f'{name}-*.in', recursive=False))
+        if not files:
+            raise FileNotFoundError(f'No {name}-XXX.in files found in {source}')
+        supercell = parse_in(files[0])
+        nat = len(supercell['ATOMIC_POSITIONS']['lines'])
+        header, footer = _merge_template(template, nat, [card for card in supercell if card in _cards])
+        numbers = [os.path.basename(file)[len(name) + 1:-3] for file in files]
+        def write_file(new_file, i):
+            with open(files[i], 'rb') as f:
+                cards = b''.join(line for line in f if not line.lstrip().startswith((b'!', b'#')))
+            return _write(new_file, [header, cards, footer])
+    else:
+        disp = read_disp(source)
+        nat = len(disp['symbols'])
+        header, footer = _merge_template(template, nat, ['CELL_PARAMETERS', 'ATOMIC_POSITIONS'])
+        if b'ATOMIC_SPECIES' not in footer:
+            raise ValueError(f'ATOMIC_SPECIES card not found in the template {template}')
+        lattice = disp['lattice']
+        unit = 'bohr' if disp['unit'] in ('au', 'bohr') else 'angstrom'
+        cell = f'CELL_PARAMETERS {unit}\n' + ''.join(_format_row(row) for row in lattice)
+        header += cell.encode() + b'ATOMIC_POSITIONS crystal\n'
+        # Format the positions once, and only the displaced atom for each file
+        symbols = disp['symbols']
+        width = max(len(symbol) for symbol in symbols)
+        lines = [_format_atom(symbol, width, position) for symbol, position in zip(symbols, disp['positions'])]
+        offsets = np.cumsum([0] + [len(line) for line in lines])
+        positions = memoryview(''.join(lines).encode())
+        displaced = disp['positions'][disp['atoms']] + disp['displacements'] @ np.linalg.inv(lattice)
+        digits = max(3, len(str(len(disp['atoms']))))
+        numbers = [f'{i:0{digits}d}' for i in range(1, len(disp['atoms']) + 1)]
+        def write_file(new_file, i):
+            atom = disp['atoms'][i]
+            line = _format_atom(symbols[atom], width, displaced[i]).encode()
+            return _write(new_file, [header, positions[:offsets[atom]], line, positions[offsets[atom + 1]:], footer])
+    new_files = [os.path.join(folder, f'{name}-{number}', f'{name}-{number}.in') for number in numbers]
+    from concurrent.futures import ThreadPoolExecutor
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(write_file, new_files, range(len(new_files))))
+
+
+def _merge_template(template:str, nat:int, replaced:list) -> tuple:
+    '''
+    Reads the QE `template` input, returning the bytes to write before and after the supercell cards:
+    the namelists, with `ibrav = 0` and the given `nat`,
+    plus the cards of the template except for the `replaced` ones.
+    The cell parameters of the namelists are removed, since they are given by the supercell.
+    '''
+    data = parse_in(template)
+    header = ''
+    footer = ''
+    for key, values in data.items():
+        if key in _cards:
+            if key not in replaced:
+                footer += _format_card(key, values)
+            continue
+        if key == 'SYSTEM':
+            values = {var: value for var, value in values.items() if var.lower() not in _cell_variables}
+            values = _set_variable(values, 'ibrav', 0)
+            values = _set_variable(values, 'nat', nat)
+        header += _format_namelist(key, values)
+    return header.encode(), footer.encode()
+
+
+_cell_variables = {
+    'a', 'b', 'c', 'cosab', 'cosac', 'cosbc',
+    'celldm(1)', 'celldm(2)', 'celldm(3)', 'celldm(4)', 'celldm(5)', 'celldm(6)'}
+'''Variables of the `&SYSTEM` namelist that define the cell, removed when setting `ibrav = 0`.'''
+
+
+def _set_variable(namelist:dict, var:str, value) -> dict:
+    '''Sets a `var` in a `namelist` dict, keeping the original case and position if it already exists.'''
+    new_namelist = {}
+    found = False
+    for key, old_value in namelist.items():
+        if key.lower() == var:
+            new_namelist[key] = value
+            found = True
+        else:
+            new_namelist[key] = old_value
+    if not found:
+        new_namelist[var] = value
+    return new_namelist
+
+
+def _format_namelist(name:str, values:dict) -> str:
+    '''Formats a namelist from a dict of `values`, as read by `thoth.qe.parse_in()`.'''
+    lines = [f'&{name}']
+    for var, value in values.items():
+        if isinstance(value, bool):
+            value = '.true.' if value else '.false.'
+        elif isinstance(value, str):
+            value = f"'{value}'"
+        lines.append(f'  {var} = {value}')
+    lines.append('/')
+    return '\n'.join(lines) + '\n'
+
+
+def _format_card(name:str, card:dict) -> str:
+    '''Formats a card with its options and raw lines, as read by `thoth.qe.parse_in()`.'''
+    options = f' {card["options"]}' if card['options'] else ''
+    return f'{name}{options}\n' + ''.join(f'  {line}\n' for line in card['lines'])
+
+
+def _format_row(row) -> str:
+    '''Formats a row of three numbers.'''
+    return f'  {row[0]:20.15f}  {row[1]:20.15f}  {row[2]:20.15f}\n'
+
+
+def _format_atom(symbol:str, width:int, position) -> str:
+    '''Formats a line of the ATOMIC_POSITIONS card.'''
+    return f'  {symbol:<{width}}' + _format_row(position)
+
+
+def _write(new_file:str, parts:list) -> str:
+    '''Writes the bytes `parts` to a `new_file`, creating its folder, and returns its path.'''
+    os.makedirs(os.path.dirname(new_file), exist_ok=True)
+    with open(new_file, 'wb') as f:
+        for part in parts:
+            f.write(part)
+    return new_file
+
+
+def read_forces(file, nat:int=None):
+    '''
+    Reads the last block of `Forces acting on atoms` of a Quantum ESPRESSO output `file`,
+    returning a NumPy array with the forces of each atom in Ry/au, or `None` if not found.
+    The number of atoms `nat` is read from the output if not provided.
+    The block is located with mmap and parsed in bulk,
+    without building a string for each atom.
+    '''
+    file = get(file)
+    if nat is None:
+        nat = _read_nat(file)
+    if _compression(file):
+        block = find(_forces_key, file, -1, nat + 1)
+        if not block:
+            return None
+        block = block[0].encode() + b'\n'
+        return _read_block(block, block.find(b'\n') + 1, nat, slice(6, 9))
+    with open(file, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.rfind(_forces_key.encode())
+            if pos == -1:
+                return None
+            line_end = mm.find(b'\n', pos)
+            if line_end == -1:
+                return None
+            return _read_block(mm, line_end + 1, nat, slice(6, 9))
+
+
+_forces_key = 'Forces acting on atoms'
+'''Header of the force blocks of Quantum ESPRESSO outputs.'''
+
+
+def write_force_sets(outputs='.',
+                     disp='phonopy_disp.yaml',
+                     file:str='FORCE_SETS',
+                     name:str='supercell',
+                     output_str:str='.out',
+                     convert:bool=True,
+                     workers:int=None):
+    '''
+    Assembles the `FORCE_SETS` `file` of Phonopy from the Quantum ESPRESSO outputs of the displaced supercells,
+    returning a NumPy array with the forces (displacements × atoms × 3).
+
+    The `outputs` can be a folder, where the output files named as `supercell-XXX.out` are searched
+    inside all the subfolders, as written by `write_supercells()`, or a list of output files,
+    in the same order as the displacements of the `disp` file, usually `phonopy_disp.yaml`.
+    Compressed outputs such as `supercell-001.out.gz` are also found.
+    The last force block of each output is read with `read_forces()`,
+    distributed over a pool of `workers` processes; `workers=1` reads them sequentially.
+    A `ValueError` is raised if the number of outputs does not match the number of displacements,
+    or if any output has a different number of atoms than the supercell or no forces,
+    listing all the wrong outputs.
+
+    By default, the forces are converted from Ry/au to eV/Å,
+    and the displacements from au to Å, as expected by Phonopy without a calculator option.
+    Set `convert=False` to keep the units of Quantum ESPRESSO, as expected by `phonopy --qe`.
+    Set `file=None` to only return the forces, for instance to pass them to the Phonopy API.
+    '''
+    data = read_disp(disp)
+    nat = len(data['symbols'])
+    if isinstance(outputs, str):
+        found = walk(outputs, f'{name}-*{output_str}*')
+        outputs = [output for output in found if output.endswith(output_str) or _compression(output)]
+        outputs.sort(key=os.path.basename)
+    if len(outputs) != len(data['atoms']):
+        raise ValueError(f'{len(outputs)} outputs found for {len(data["atoms"])} displacements')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(outputs))
+    if workers <= 1:
+        results = list(map(_read_forces_checked, outputs, repeat(nat)))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(outputs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_read_forces_checked, outputs, repeat(nat), chunksize=chunksize))
+    errors = [error for _, error in results if error]
+    if errors:
+        raise ValueError('Wrong outputs for FORCE_SETS:\n' + '\n'.join(errors))
+    forces = np.empty((len(outputs), nat, 3))
+    for i, (output_forces, _) in enumerate(results):
+        forces[i] = output_forces
+    displacements = data['displacements']
+    if convert:
+        forces *= _ry_au_to_ev_angstrom
+        if data['unit'] in ('au', 'bohr'):
+            displacements = displacements * _bohr_to_angstrom
+    if file:
+        row = '  %20.16f  %20.16f  %20.16f\n'
+        with open(file, 'w') as f:
+            f.write(f'{nat}\n{len(outputs)}\n')
+            for atom, displacement, output_forces in zip(data['atoms'], displacements, forces):
+                f.write(f'\n{atom + 1}\n' + row % tuple(displacement))
+                f.write((row * nat) % tuple(output_forces.ravel()))
+    return forces
+
+
+def _read_forces_checked(file, nat:int) -> tuple:
+    '''
+    Reads the forces of an output `file` for `write_force_sets()`,
+    returning a tuple with the forces and an error message, if any.
+    '''
+    try:
+        file_nat = _read_nat(file)
+    except ValueError as error:
+        return None, str(error)
+    if file_nat != nat:
+        return None, f'{file} has {file_nat} atoms instead of {nat}'
+    forces = read_forces(file, nat)
+    if forces is None:
+        return None, f'Forces not found in {file}'
+    return forces, None
+
+
+_ry_au_to_ev_angstrom = 25.71104309541616
+'''Conversion factor of forces from Ry/au to eV/Å.'''
+
+_bohr_to_angstrom = 0.529177210903
+'''Conversion factor of lengths from au (Bohr) to Å.'''
+
+
+def read_yaml(file, eigenvectors:bool=False, cache=False) -> dict:
+    '''
+    Reads a `band.yaml`, `mesh.yaml` or `qpoints.yaml` file from Phonopy,
+    returning a dict with the following NumPy arrays:
+    `'qpoints'` (q-points × 3), `'frequencies'` (q-points × bands),
+    `'weights'` (q-points, only for meshes), `'distances'` (q-points, for band structures and meshes),
+    and `'eigenvectors'` (q-points × bands × atoms × 3, complex) if `eigenvectors=True` and present in the file.
+
+    The file is scanned with mmap, relying on the fixed layout written by Phonopy,
+    and the values of each field are parsed in bulk, so only the requested fields are kept in memory.
+    To access the eigenvectors of each q-point only when needed, check `Phonons`.
+
+    With `cache=True`, the arrays are saved to a `.npz` file next to the `file`, such as `mesh.yaml.npz`,
+    or to the path given as `cache`, and loaded from it while the YAML file does not change.
+    '''
+    file = get(file)
+    if cache:
+        cache = file + '.npz' if cache is True else cache
+        stat = os.stat(file)
+        stamp = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        if os.path.exists(cache):
+            with np.load(cache) as cached:
+                if np.array_equal(cached['stamp'], stamp) and (not eigenvectors or 'eigenvectors' in cached):
+                    return {key: cached[key] for key in cached.files if key != 'stamp'
+                            and (eigenvectors or key != 'eigenvectors')}
+    phonons = Phonons(file)
+    data = {'qpoints': phonons.qpoints, 'frequencies': phonons.frequencies}
+    if phonons.weights is not None:
+        data['weights'] = phonons.weights
+    if phonons.distances is not None:
+        data['distances'] = phonons.distances
+    if eigenvectors and phonons.has_eigenvectors:
+        data['eigenvectors'] = phonons.all_eigenvectors()
+    if cache:
+        folder = os.path.dirname(os.path.abspath(cache))
+        fd, temp_path = tempfile.mkstemp(prefix='.thoth_', suffix='.npz', dir=folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, stamp=stamp, **data)
+            os.replace(temp_path, cache)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return data
+
+
+class Phonons:
+    '''
+    Lazy reader of the phonons of a `band.yaml`, `mesh.yaml` or `qpoints.yaml` file from Phonopy.
+    The file is scanned once with mmap when created, reading the q-points, frequencies, weights and distances
+    and the byte position of each q-point, but not the eigenvectors,
+    which are only read for the requested q-points:
+    ```python
+    phonons = thoth.phonopy.Phonons('mesh.yaml')
+    phonons.frequencies[10]      # Frequencies of the q-point 10, in THz
+    phonons.eigenvectors(10)     # bands × atoms × 3 complex array
+    phonons[10]                  # dict with all the values of the q-point 10
+    ```
+    '''
+    def __init__(self, file):
+        self.file = get(file)
+        '''Full path of the YAML file.'''
+        with open(self.file, 'r+b') as f:
+            with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+                self.offsets = np.array([match.start() for match in _yaml_qpoint.finditer(mm)] + [len(mm)], dtype=np.int64)
+                '''Byte positions of the start of each q-point, plus the end of the file.'''
+                header = mm[:self.offsets[0]]
+                self.qpoints = _to_array(_yaml_qpoint.findall(mm), 3)
+                '''Array with the reduced coordinates of the q-points.'''
+                frequencies = np.array(_yaml_frequency.findall(mm, self.offsets[0]), dtype=float)
+                weights = _yaml_weight.findall(mm, self.offsets[0])
+                distances = _yaml_distance.findall(mm, self.offsets[0])
+                has_eigenvectors = mm.find(b'eigenvector:', self.offsets[0]) != -1
+        nqpoints = len(self.qpoints)
+        self.frequencies = frequencies.reshape(nqpoints, -1) if nqpoints else frequencies.reshape(0, 0)
+        '''Array with the frequencies of each q-point and band, in the units of the file (THz by default).'''
+        self.weights = np.array(weights, dtype=int) if len(weights) == nqpoints and weights else None
+        '''Array with the weights of the q-points of a mesh, or `None`.'''
+        self.distances = np.array(distances, dtype=float) if len(distances) == nqpoints and distances else None
+        '''Array with the distances of the q-points along the band path, or from Gamma for meshes, or `None`.'''
+        natom = _yaml_natom.search(header)
+        self.natom = int(natom.group(1)) if natom else self.frequencies.shape[1] // 3
+        '''Number of atoms.'''
+        self.has_eigenvectors = has_eigenvectors
+        '''`True` if the file contains eigenvectors.'''
+
+    def __len__(self) -> int:
+        return len(self.qpoints)
+
+    def __getitem__(self, index:int) -> dict:
+        '''Returns a dict with all the values of the q-point `index`.'''
+        index = range(len(self))[index]
+        return {
+            'qpoint': self.qpoints[index],
+            'frequencies': self.frequencies[index],
+            'weight': self.weights[index] if self.weights is not None else None,
+            'distance': self.distances[index] if self.distances is not None else None,
+            'eigenvectors': self.eigenvectors(index) if self.has_eigenvectors else None,
+        }
+
+    def eigenvectors(self, index:int):
+        '''
+        Returns the eigenvectors of the q-point `index` as a complex array (bands × atoms × 3),
+        reading only its part of the file.
+        '''
+        index = range(len(self))[index]
+        with open(self.file, 'r+b') as f:
+            with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+                return self._eigenvectors(mm, index)
+
+    def all_eigenvectors(self):
+        '''
+        Returns the eigenvectors of all the q-points as a complex array (q-points × bands × atoms × 3),
+        reading them one q-point at a time.
+        '''
+        eigenvectors = np.empty((len(self), self.frequencies.shape[1], self.natom, 3), dtype=complex)
+        with open(self.file, 'r+b') as f:
+            with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+                for index in range(len(self)):
+                    eigenvectors[index] = self._eigenvectors(mm, index)
+        return eigenvectors
+
+    def _eigenvectors(self, mm, index:int):
+        '''Parses the eigenvectors of the q-point `index` from the memory map `mm`.'''
+        pairs = _yaml_eigenvector.findall(mm, self.offsets[index], self.offsets[index + 1])
+        nbands = self.frequencies.shape[1]
+        if len(pairs) != nbands * self.natom * 3:
+            raise ValueError(f'Eigenvectors of the q-point {index} not found in {self.file}')
+        values = np.array(pairs, dtype=float)
+        return (values[:, 0] + 1j * values[:, 1]).reshape(nbands, self.natom, 3)
+
+
+_yaml_qpoint = re.compile(rb'- q-position:\s*\[([^\]]*)\]')
+'''Start of a q-point in Phonopy YAML files, with its reduced coordinates.'''
+
+_yaml_frequency = re.compile(rb'\n\s+frequency:\s*(\S+)')
+'''Frequency of a band.'''
+
+_yaml_weight = re.compile(rb'\n\s+weight:\s*(\d+)')
+'''Weight of a q-point of a mesh.'''
+
+_yaml_distance = re.compile(rb'\n\s+distance(?:_from_gamma)?:\s*(\S+)')
+'''Distance of a q-point along the band path, or from Gamma.'''
+
+_yaml_natom = re.compile(rb'(?:^|\n)natom:\s*(\d+)')
+'''Number of atoms.'''
+
+_yaml_eigenvector = re.compile(rb'- \[\s*([^,\]\s]+)\s*,\s*([^,\]\s]+)\s*\]')
+'''Real and imaginary parts of an eigenvector component.'''
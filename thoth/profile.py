@@ -0,0 +1,374 @@
+'''
+# Description
+Opt-in instrumentation of Thoth functions, to find out where the time goes
+when processing many or large files.
+It records, for each function of `thoth.file`, `thoth.text`, `thoth.extract` and `thoth.qe`,
+the number of calls, the wall time, the number of files opened and memory-mapped,
+the bytes mapped for scanning, the matches and decoded characters returned by `thoth.text` and `thoth.extract`,
+and the metadata system calls counted by `thoth.file.syscalls`.
+
+Profiling is enabled with the `record()` context manager:
+```python
+with thoth.profile.record():
+    thoth.qe.read_dirs('calcs')
+print(thoth.profile.summary())
+thoth.profile.to_json('profile.json')
+thoth.profile.to_pstats('profile.prof')  # Open with pstats or snakeviz
+```
+or for a whole script by setting the `THOTH_PROFILE` environment variable:
+with `THOTH_PROFILE=1` the summary is printed at exit,
+and with `THOTH_PROFILE=profile.json` or `THOTH_PROFILE=profile.prof`
+the results are saved to the given JSON or pstats file.
+
+The functions are only wrapped while profiling, so there is no cost at all when disabled.
+Times and counters are inclusive, as the `cumtime` of cProfile, except for `'own_time'`,
+which excludes the time spent in other instrumented functions.
+Calculations running in other processes, such as `thoth.qe.read_dirs()` with `workers`,
+are not recorded, so set `workers=1` to profile them.
+
+# Index
+- `record()`
+- `start()`
+- `stop()`
+- `reset()`
+- `summary()`
+- `to_json()`
+- `to_pstats()`
+
+---
+'''
+
+
+import os
+import sys
+import json
+import time
+import mmap
+import atexit
+import marshal
+import builtins
+import functools
+import inspect
+import importlib
+import threading
+from contextlib import contextmanager
+from .common import version
+
+
+modules = ['file', 'text', 'extract', 'qe']
+'''Names of the Thoth modules whose functions are instrumented.'''
+
+stats = {}
+'''
+Results of the profiling, as `{function: {counter: value}}`,
+with the following counters: `'calls'`, `'time'` and `'own_time'` in seconds,
+`'opens'`, `'mmaps'`, `'bytes_mapped'`, `'matches'`, `'decoded'`, `'scandir'` and `'stat'`.
+'''
+
+enabled = False
+'''`True` while profiling.'''
+
+
+@contextmanager
+def record(reset_stats:bool=True):
+    '''
+    Context manager that profiles the Thoth functions called inside it, yielding the `stats` dict.
+    Previous results are removed, unless `reset_stats=False`.
+    '''
+    if reset_stats:
+        reset()
+    was_enabled = enabled
+    start()
+    try:
+        yield stats
+    finally:
+        if not was_enabled:
+            stop()
+
+
+def start() -> None:
+    '''
+    Starts profiling, by replacing the functions of the instrumented `modules` with timed wrappers.
+    '''
+    global enabled
+    if enabled:
+        return None
+    from . import file
+    for module_name in modules:  # Submodules are loaded lazily
+        importlib.import_module('thoth.' + module_name)
+    namespaces = [vars(module) for name, module in list(sys.modules.items())
+                  if (name == 'thoth' or name.startswith('thoth.')) and name != __name__ and module is not None]
+    wrappers = {}
+    for module_name in modules:
+        module = sys.modules['thoth.' + module_name]
+        for name, obj in list(vars(module).items()):
+            if _is_function(obj, module.__name__):
+                wrappers[id(obj)] = (obj, _wrap(obj, f'{module_name}.{name}', module_name in _matching))
+            elif inspect.isclass(obj) and obj.__module__ == module.__name__:
+                for attr, method in list(vars(obj).items()):
+                    if attr.startswith('__') and attr != '__init__':
+                        continue
+                    if inspect.isfunction(method):
+                        _patch(obj, attr, _wrap(method, f'{module_name}.{name}.{attr}'))
+    # Replace the functions in all the namespaces where they were imported
+    for namespace in namespaces:
+        for name, obj in list(namespace.items()):
+            if id(obj) in wrappers and wrappers[id(obj)][0] is obj:
+                _patch(namespace, name, wrappers[id(obj)][1])
+        if namespace.get('mmap') is mmap:
+            _patch(namespace, 'mmap', _mmap)
+        if namespace.get('__name__', '').split('.')[-1] in modules:
+            _patch(namespace, 'open', _open)
+    pandas = sys.modules.get('pandas')
+    if pandas is not None:  # Not imported just to profile it
+        _patch(pandas, 'concat', _wrap(pandas.concat, 'pandas.concat'))
+    _syscalls.append(file.syscalls)
+    enabled = True
+    return None
+
+
+def stop() -> None:
+    '''
+    Stops profiling, restoring the original functions. The results are kept in `stats`.
+    '''
+    global enabled
+    while _patches:
+        target, name, original = _patches.pop()
+        if isinstance(target, dict):
+            if original is _missing:
+                target.pop(name, None)
+            else:
+                target[name] = original
+        else:
+            setattr(target, name, original)
+    _syscalls.clear()
+    enabled = False
+    return None
+
+
+def reset() -> None:
+    '''Removes the results of previous profiling.'''
+    stats.clear()
+    return None
+
+
+def summary(sort:str='time', limit:int=30) -> str:
+    '''
+    Returns a table with the profiled functions, sorted by the given `sort` counter,
+    showing up to `limit` functions.
+    '''
+    columns = ['calls', 'time', 'own_time', 'opens', 'mmaps', 'bytes_mapped', 'matches', 'decoded', 'scandir', 'stat']
+    rows = sorted(stats.items(), key=lambda item: item[1].get(sort, 0), reverse=True)[:limit]
+    width = max([len('function')] + [len(name) for name, _ in rows])
+    lines = ['function'.ljust(width) + ''.join(column.rjust(13) for column in columns)]
+    for name, values in rows:
+        line = name.ljust(width)
+        for column in columns:
+            value = values[column]
+            line += (f'{value:13.4f}' if isinstance(value, float) else f'{value:13d}')
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def to_json(file:str=None) -> str:
+    '''
+    Returns the results of the profiling as a JSON string, saving them to a `file` if provided.
+    '''
+    text = json.dumps({'version': version, 'functions': stats}, indent=1)
+    if file:
+        with open(file, 'w') as f:
+            f.write(text)
+    return text
+
+
+def to_pstats(file:str) -> None:
+    '''
+    Saves the call counts and times to a `file` that can be loaded with `pstats.Stats(file)`,
+    or with other tools for cProfile results.
+    '''
+    profile = {}
+    for name, values in stats.items():
+        location = _locations.get(name, ('~', 0, name))
+        profile[location] = (values['calls'], values['calls'], values['own_time'], values['time'], {})
+    with open(file, 'wb') as f:
+        marshal.dump(profile, f)
+    return None
+
+
+def _is_function(obj, module_name:str) -> bool:
+    '''Checks if `obj` is a function, or a cached function, defined in the given module.'''
+    if inspect.isfunction(obj):
+        return obj.__module__ == module_name
+    wrapped = inspect.getattr_static(obj, '__wrapped__', None)  # Without triggering lazy imports
+    return callable(obj) and inspect.isfunction(wrapped) and wrapped.__module__ == module_name
+
+
+def _patch(target, name:str, value) -> None:
+    '''Replaces `name` in a namespace dict or object `target`, keeping the original to restore it.'''
+    if isinstance(target, dict):
+        _patches.append((target, name, target.get(name, _missing)))
+        target[name] = value
+    else:
+        _patches.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+    return None
+
+
+def _wrap(function, name:str, matching:bool=False):
+    '''
+    Returns a wrapper of a `function` that records its `stats` under the given `name`.
+    The matches and decoded characters of the results are counted if `matching=True`.
+    '''
+    code = getattr(inspect.unwrap(function), '__code__', None)
+    if code:
+        _locations[name] = (code.co_filename, code.co_firstlineno, name)
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def generator_wrapper(*args, **kwargs):
+            iterator = function(*args, **kwargs)
+            calls = 1
+            while True:
+                state = _begin()
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    _end(name, state, None, calls)
+                    return
+                except BaseException:
+                    _end(name, state, None, calls)
+                    raise
+                _end(name, state, None, calls)
+                calls = 0
+                yield value
+        return generator_wrapper
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        state = _begin()
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        finally:
+            _end(name, state, result if matching else None, 1)
+    return wrapper
+
+
+def _begin() -> tuple:
+    '''Starts timing a call, returning its initial state.'''
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.0)
+    syscalls = _syscalls[0] if _syscalls else {}
+    return (time.perf_counter(), dict(_counters), dict(syscalls))
+
+
+def _end(name:str, state:tuple, result, calls:int) -> None:
+    '''Finishes timing a call, adding its time and counters to the `stats` of the function `name`.'''
+    elapsed = time.perf_counter() - state[0]
+    stack = _local.stack
+    child_time = stack.pop()
+    if stack:
+        stack[-1] += elapsed
+    matches, decoded = _count(result)
+    syscalls = _syscalls[0] if _syscalls else {}
+    with _lock:
+        entry = stats.get(name)
+        if entry is None:
+            entry = stats[name] = {
+                'calls': 0, 'time': 0.0, 'own_time': 0.0, 'opens': 0, 'mmaps': 0, 'bytes_mapped': 0,
+                'matches': 0, 'decoded': 0, 'scandir': 0, 'stat': 0}
+        entry['calls'] += calls
+        entry['time'] += elapsed
+        entry['own_time'] += elapsed - child_time
+        entry['matches'] += matches
+        entry['decoded'] += decoded
+        for key, value in _counters.items():
+            entry[key] += value - state[1][key]
+        for key, value in syscalls.items():
+            entry[key] += value - state[2].get(key, 0)
+    return None
+
+
+def _count(result) -> tuple:
+    '''Returns the number of matches and decoded characters of the `result` of a function.'''
+    if isinstance(result, str):
+        return 0, len(result)
+    if isinstance(result, list):
+        return len(result), sum(len(item) for item in result if isinstance(item, str))
+    if isinstance(result, dict):
+        matches = 0
+        decoded = 0
+        for value in result.values():
+            if isinstance(value, list):
+                matches += len(value)
+                decoded += sum(len(item) for item in value if isinstance(item, str))
+        return matches, decoded
+    return 0, 0
+
+
+def _open(*args, **kwargs):
+    '''Counts the files opened by the instrumented modules.'''
+    _counters['opens'] += 1
+    return builtins.open(*args, **kwargs)
+
+
+class _Mmap:
+    '''Replaces the `mmap` module inside the instrumented modules to count the memory maps and their size.'''
+    def __getattr__(self, name):
+        return getattr(mmap, name)
+
+    def mmap(self, *args, **kwargs):
+        mm = mmap.mmap(*args, **kwargs)
+        _counters['mmaps'] += 1
+        _counters['bytes_mapped'] += len(mm)
+        return mm
+
+
+_mmap = _Mmap()
+'''Counting replacement of the `mmap` module.'''
+
+_matching = ('text', 'extract')
+'''Modules whose results are counted as matches and decoded characters.'''
+
+_counters = {'opens': 0, 'mmaps': 0, 'bytes_mapped': 0}
+'''Global I/O counters, updated by `_open()` and `_mmap`.'''
+
+_syscalls = []
+'''The `thoth.file.syscalls` dict while profiling.'''
+
+_patches = []
+'''Replaced names as `(target, name, original)`, restored by `stop()`.'''
+
+_missing = object()
+'''Marker of names that did not exist before patching.'''
+
+_locations = {}
+'''File, line and name of each instrumented function, for `to_pstats()`.'''
+
+_local = threading.local()
+'''Stack of the child times of the running calls, per thread.'''
+
+_lock = threading.Lock()
+'''Lock to update the `stats` from several threads.'''
+
+
+def _from_environment() -> None:
+    '''Enables profiling for the whole process if the `THOTH_PROFILE` environment variable is set.'''
+    target = os.environ.get('THOTH_PROFILE')
+    if not target or target == '0':
+        return None
+    def report():
+        stop()
+        if target.endswith('.json'):
+            to_json(target)
+        elif target != '1':
+            to_pstats(target)
+        else:
+            print(summary(), file=sys.stderr)
+    start()
+    atexit.register(report)
+    return None
+
+
+_from_environment()
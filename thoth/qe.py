@@ -4,54 +4,243 @@ Functions to work with [Quantum ESPRESSO](https://www.quantum-espresso.org/) cal
 
 # Index
 - `read_in()`
+- `parse_in()`
 - `read_out()`
+- `read_traj()`
+- `iter_traj()`
+- `Follower`
+- `watch()`
 - `read_dir()`
 - `read_dirs()`
+- `run_dirs()`
 
 ---
 '''
 
 
-import pandas as pd
+from __future__ import annotations
 import os
-from .file import get, get_list
-from .text import find
+import re
+import mmap
+import json
+import time
+import sqlite3
+import tempfile
+import importlib
+from itertools import repeat
+from .common import version
+from .call import batch
+from .file import get, walk
+from .text import find, find_many, _compression, _open_stream
 from .extract import number, string
 
 
+class _LazyModule:
+    '''
+    Placeholder of a module that is imported on first use,
+    so that `import thoth` does not import pandas and NumPy.
+    After the import, the placeholder is replaced by the module in the namespace of `thoth.qe`.
+    '''
+    def __init__(self, name:str, alias:str):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+pd = _LazyModule('pandas', 'pd')
+'''pandas, imported on first use.'''
+
+np = _LazyModule('numpy', 'np')
+'''NumPy, imported on first use.'''
+
+
+cache_file = '.thoth_qe_cache.sqlite'
+'''
+Default name of the SQLite cache file created by `read_dirs()` when using `cache=True`.
+'''
+
+queue_file = '.thoth_qe_queue.json'
+'''
+Default name of the JSON file where `run_dirs()` stores the state of the queue.
+'''
+
+
 def read_in(file) -> pd.DataFrame:
     '''
     Reads an input `file` from Quantum ESPRESSO,
     returning a Pandas DataFrame with the input values used.
     The columns are named after the name of the corresponding variable.
+    Values are typed as in `parse_in()`, so strings are returned without quotes.
+    The first line of the K_POINTS card is stored in the 'K_POINTS' column.
     '''
-    file = get(file)
+    parsed = parse_in(file)
     data = {}
-    lines = find('=', file)
-    for line in lines:
-        line.strip()
-        var, value = line.split('=', 1)
-        var = var.strip()
-        value = value.strip()
-        if var.startswith('!'):
+    for name, section in parsed.items():
+        if name in _cards:
             continue
-        try:
-            value_float = value.replace('d', 'e')
-            value_float = value_float.replace('D', 'e')
-            value_float = value_float.replace('E', 'e')
-            value_float = float(value_float)
-            value = value_float
-        except ValueError:
-            pass # Then it is a string
-        data[var] = value
-    # Get values that are not expressed with a '=' sign
-    k_points = find('K_POINTS', file, -1, 1, True)
-    if k_points:
-        k_points = k_points[1].strip()
-        data['K_POINTS'] = k_points
+        data.update(section)
+    if 'K_POINTS' in parsed:
+        lines = parsed['K_POINTS']['lines']
+        if lines:
+            data['K_POINTS'] = lines[0]
     return pd.DataFrame.from_dict([data])
 
 
+def parse_in(file) -> dict:
+    '''
+    Parses an input `file` from Quantum ESPRESSO in a single pass.
+    Returns a dict with a dict of variables for each namelist, such as `'CONTROL'` or `'SYSTEM'`,
+    and a dict for each card, such as `'ATOMIC_POSITIONS'`, with its `'options'` and raw `'lines'`.
+    Namelist values are converted to `bool`, `int`, `float` or `str`,
+    handling Fortran exponents and comma-separated assignments.
+    Known cards are also parsed into typed fields:
+    - `ATOMIC_SPECIES`: `'species'`, `'masses'` and `'pseudos'`.
+    - `ATOMIC_POSITIONS`: `'species'`, `'positions'` and `'if_pos'` (or `None` if not present).
+    - `CELL_PARAMETERS`: `'cell'`.
+    - `K_POINTS`: `'grid'` and `'shift'` for automatic grids, or `'points'` with their weights.
+    Coordinates are returned as NumPy arrays.
+    '''
+    file = get(file)
+    with open(file, 'r') as f:
+        text = f.read()
+    data = {}
+    section = None
+    card = None
+    for line in text.splitlines():
+        if '!' in line or '#' in line:
+            line = _strip_comment(line)
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] == '&':
+            card = None
+            section = {}
+            name, line = _namelist_start.match(line).groups()
+            data[name.upper()] = section
+            line = line.strip()
+            if not line:
+                continue
+        if section is not None:
+            end = line[-1] == '/'
+            if end:
+                line = line[:-1]
+            for var, value in _assignment.findall(line):
+                section[var.replace(' ', '')] = _to_value(value.strip())
+            if end:
+                section = None
+            continue
+        name = line.split(None, 1)[0].upper()
+        if name in _cards:
+            options = line[len(name):].strip(' \t{}()=')
+            card = {'options': options.lower() if options else None, 'lines': []}
+            data[name] = card
+        elif card is not None:
+            card['lines'].append(line)
+    for name, parser in _card_parsers.items():
+        if name in data:
+            data[name].update(parser(data[name]['lines']))
+    return data
+
+
+def _strip_comment(line:str) -> str:
+    '''Removes Fortran comments starting with `!` or `#` from a `line`, ignoring them inside quotes.'''
+    quote = None
+    for i, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char in '!#':
+            return line[:i]
+    return line
+
+
+def _to_value(value:str):
+    '''Converts a namelist `value` to `bool`, `int`, `float` or unquoted `str`.'''
+    if value[:1] in '\'"' and value[-1:] == value[:1] and len(value) > 1:
+        return value[1:-1]
+    lower = value.lower()
+    if lower in _logicals:
+        return _logicals[lower]
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(lower.replace('d', 'e'))
+    except ValueError:
+        return value
+
+
+def _parse_species(lines:list) -> dict:
+    '''Parses the ATOMIC_SPECIES card.'''
+    rows = [line.split() for line in lines]
+    return {
+        'species': [row[0] for row in rows],
+        'masses': np.array([float(row[1].lower().replace('d', 'e')) for row in rows]),
+        'pseudos': [row[2] if len(row) > 2 else None for row in rows],
+    }
+
+
+def _parse_positions(lines:list) -> dict:
+    '''Parses the ATOMIC_POSITIONS card, including the optional `if_pos` constraints.'''
+    rows = [line.lower().replace('d', 'e').split() for line in lines]
+    species = [line.split(None, 1)[0] for line in lines]
+    positions = np.array([row[1:4] for row in rows], dtype=float).reshape(-1, 3)
+    if_pos = None
+    if any(len(row) > 4 for row in rows):
+        if_pos = np.array([row[4:7] if len(row) > 4 else ('1', '1', '1') for row in rows], dtype=int)
+    return {'species': species, 'positions': positions, 'if_pos': if_pos}
+
+
+def _parse_cell(lines:list) -> dict:
+    '''Parses the CELL_PARAMETERS card.'''
+    rows = [line.lower().replace('d', 'e').split()[:3] for line in lines[:3]]
+    return {'cell': np.array(rows, dtype=float).reshape(-1, 3)}
+
+
+def _parse_k_points(lines:list) -> dict:
+    '''Parses the K_POINTS card, for both automatic grids and explicit lists of points.'''
+    if not lines:
+        return {}
+    values = lines[0].split()
+    if len(values) == 6:
+        return {'grid': np.array(values[:3], dtype=int), 'shift': np.array(values[3:], dtype=int)}
+    nks = int(values[0])
+    rows = [line.lower().replace('d', 'e').split()[:4] for line in lines[1:nks+1]]
+    return {'points': np.array(rows, dtype=float).reshape(-1, 4)}
+
+
+_assignment = re.compile(r"([A-Za-z_]\w*(?:\s*\([^)]*\))?)\s*=\s*('[^']*'|\"[^\"]*\"|[^,]+)")
+'''Pattern of a namelist assignment, such as `ecutwfc = 60.0` or `celldm(1) = 10.2`.'''
+
+_namelist_start = re.compile(r'&(\w*)(.*)')
+'''Pattern of the first line of a namelist, with its name and the rest of the line, such as `&IONS /`.'''
+
+_logicals = {'.true.': True, '.t.': True, 't': True, 'true': True, '.false.': False, '.f.': False, 'f': False, 'false': False}
+'''Fortran logical values.'''
+
+_card_parsers = {
+    'ATOMIC_SPECIES': _parse_species,
+    'ATOMIC_POSITIONS': _parse_positions,
+    'CELL_PARAMETERS': _parse_cell,
+    'K_POINTS': _parse_k_points,
+}
+'''Parsers of the cards with typed fields.'''
+
+_cards = {
+    'ATOMIC_SPECIES', 'ATOMIC_POSITIONS', 'K_POINTS', 'CELL_PARAMETERS', 'OCCUPATIONS',
+    'CONSTRAINTS', 'ATOMIC_VELOCITIES', 'ATOMIC_FORCES', 'ADDITIONAL_K_POINTS',
+    'SOLVENTS', 'HUBBARD',
+}
+'''Names of the cards of pw.x input files.'''
+
+
 def read_out(file) -> pd.DataFrame:
     '''
     Reads an output `file` from Quantum ESPRESSO,
@@ -59,6 +248,7 @@ def read_out(file) -> pd.DataFrame:
     `'Energy'` (float), `'Total force'` (float), `'Total SCF correction'` (float),
     `'Runtime'` (str), `'JOB DONE'` (bool), `'BFGS converged'` (bool), `'BFGS failed'` (bool),
     `'Maxiter reached'` (bool), `'Error'` (str), `'Success'` (bool).
+    Compressed files, such as `relax.out.gz`, are read directly as in `thoth.text.find_many()`.
     '''
     file = get(file)
 
@@ -73,14 +263,28 @@ def read_out(file) -> pd.DataFrame:
     maxiter_reached_key  = 'Maximum number of iterations reached'
     error_key            = 'Error in routine'
 
-    energy_line          = find(energy_key, file, -1)
-    force_line           = find(force_key, file, -1)
-    time_line            = find(time_key, file, -1)
-    job_done_line        = find(job_done_key, file, -1)
-    bfgs_converged_line  = find(bfgs_converged_key, file, -1)
-    bfgs_failed_line     = find(bfgs_failed_key, file, -1)
-    maxiter_reached_line = find(maxiter_reached_key, file, -1)
-    error_line           = find(error_key, file, -1, 1, True)
+    keywords = {
+        'energy'          : energy_key,
+        'force'           : force_key,
+        'time'            : time_key,
+        'job_done'        : job_done_key,
+        'bfgs_converged'  : bfgs_converged_key,
+        'bfgs_failed'     : bfgs_failed_key,
+        'maxiter_reached' : maxiter_reached_key,
+        'error'           : error_key,
+    }
+    # Single pass over the file, getting the last match plus the line below
+    lines = find_many(keywords, file, -1, 1)
+    lines = {name: match[0].splitlines() for name, match in lines.items() if match}
+
+    energy_line          = lines.get('energy')
+    force_line           = lines.get('force')
+    time_line            = lines.get('time')
+    job_done_line        = lines.get('job_done')
+    bfgs_converged_line  = lines.get('bfgs_converged')
+    bfgs_failed_line     = lines.get('bfgs_failed')
+    maxiter_reached_line = lines.get('maxiter_reached')
+    error_line           = lines.get('error')
 
     energy: float = None
     force: float = None
@@ -109,7 +313,7 @@ def read_out(file) -> pd.DataFrame:
     if maxiter_reached_line:
         maxiter_reached = True
     if error_line:
-        error = error_line[1].strip()
+        error = error_line[-1].strip()
     if job_done and not bfgs_failed and not maxiter_reached and not error:
         success = True
 
@@ -128,6 +332,361 @@ def read_out(file) -> pd.DataFrame:
     return pd.DataFrame.from_dict([output])
 
 
+def read_traj(file) -> dict:
+    '''
+    Reads the trajectory of a relax or molecular dynamics output `file` from Quantum ESPRESSO,
+    returning a dict with the following NumPy arrays, with one row per SCF step:
+    `'Energy'` (steps), `'Forces'` (steps × atoms × 3), `'Positions'` (steps × atoms × 3)
+    and `'Cell'` (steps × 3 × 3).
+    The positions and cell of each step are the updated ones printed after it;
+    missing values, such as the cell of a fixed-cell relaxation, are filled with NaN.
+    The values are in the units of the output file:
+    Ry for the energies, Ry/au for the forces, and the units of the corresponding card for positions and cell.
+    To read files that do not fit in memory, check `iter_traj()`.
+    '''
+    file = get(file)
+    nat = _read_nat(file)
+    steps = list(iter_traj(file))
+    blocks = {'Forces': (nat, 3), 'Positions': (nat, 3), 'Cell': (3, 3)}
+    traj = {'Energy': np.array([step['Energy'] for step in steps], dtype=np.float64)}
+    for key, shape in blocks.items():
+        traj[key] = np.full((len(steps),) + shape, np.nan)
+        for i, step in enumerate(steps):
+            if step[key] is not None:
+                traj[key][i] = step[key]
+    return traj
+
+
+def iter_traj(file):
+    '''
+    Iterates over the SCF steps of a relax or molecular dynamics output `file` from Quantum ESPRESSO,
+    yielding one dict per step with the same keys as `read_traj()`,
+    with `None` instead of the arrays that are not present for the step.
+    Only the current step is kept in memory, so it can be used for files of any size.
+    The blocks are located with mmap, and parsed in bulk with NumPy,
+    including numbers with Fortran `D` exponents.
+    Compressed files, such as `relax.out.gz`, are decompressed by chunks, one step at a time.
+    '''
+    file = get(file)
+    nat = _read_nat(file)
+    keys = {
+        'Energy'    : b'!    total energy',
+        'Forces'    : b'Forces acting on atoms',
+        'Cell'      : b'CELL_PARAMETERS',
+        'Positions' : b'ATOMIC_POSITIONS',
+    }
+    blocks = {  # Number of lines and columns to read, after the header
+        'Forces'    : (nat, slice(6, 9)),
+        'Cell'      : (3, slice(0, 3)),
+        'Positions' : (nat, slice(1, 4)),
+    }
+    if _compression(file):
+        # Each segment of the decompressed file starts with a new step
+        with _open_stream(file) as f:
+            for segment in _segments(f, keys['Energy']):
+                yield from _iter_steps(segment, keys, blocks)
+        return
+    with open(file, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            yield from _iter_steps(mm, keys, blocks)
+
+
+def _iter_steps(mm, keys:dict, blocks:dict):
+    '''
+    Yields the SCF steps found in the memory map or bytes `mm`, as in `iter_traj()`.
+    '''
+    # Merge the positions of all the keys, from the start to the end of the file
+    next_pos = {key: mm.find(keyword) for key, keyword in keys.items()}
+    step = None
+    while True:
+        found = {key: pos for key, pos in next_pos.items() if pos != -1}
+        if not found:
+            break
+        key = min(found, key=found.get)
+        pos = found[key]
+        line_end = mm.find(b'\n', pos)
+        line_end = len(mm) if line_end == -1 else line_end + 1
+        next_pos[key] = mm.find(keys[key], line_end)
+        if key == 'Energy':
+            if step is not None:
+                yield step
+            step = {'Energy': number(mm[pos:line_end].decode(), 'total energy')}
+            step.update({block: None for block in blocks})
+        elif step is not None:
+            lines, columns = blocks[key]
+            step[key] = _read_block(mm, line_end, lines, columns)
+    if step is not None:
+        yield step
+
+
+def _segments(f, keyword:bytes):
+    '''
+    Reads the file object `f` by chunks, yielding segments of bytes that are cut
+    at the start of the lines containing the `keyword`, so that only one segment is kept in memory.
+    '''
+    data = b''
+    while True:
+        chunk = f.read(_SEGMENT_SIZE)
+        if not chunk:
+            if data:
+                yield data
+            return
+        data += chunk
+        pos = data.rfind(keyword, max(len(data) - len(chunk) - len(keyword), 0))
+        if pos > 0:
+            cut = data.rfind(b'\n', 0, pos) + 1
+            if cut > 0:
+                yield data[:cut]
+                data = data[cut:]
+
+
+_SEGMENT_SIZE = 1 << 20
+'''Size in bytes of the chunks read by `_segments()`.'''
+
+
+class Follower:
+    '''
+    Follows a Quantum ESPRESSO output `file` while the calculation is running.
+    Each call to `poll()` parses only the bytes appended since the previous call,
+    returning a list of `(event, value)` tuples with the following events:
+    `'SCF iteration'` (int), `'BFGS step'` (int), `'Energy'` (float), `'Total force'` (float),
+    `'Runtime'` (str), `'JOB DONE'`, `'BFGS converged'`, `'BFGS failed'`, `'Maxiter reached'` (True),
+    `'Error'` (str) and `'Reset'` (None), emitted when the file is truncated or replaced,
+    after which it is parsed again from the start.
+    The latest values are kept in `state`, with the same keys as the columns of `read_out()`,
+    plus the number of `'SCF iterations'` and `'BFGS steps'`.
+    The file does not need to exist yet. Usage example:
+    ```python
+    follower = thoth.qe.Follower('relax.out')
+    while not follower.finished:
+        for event, value in follower.poll():
+            print(event, value)
+        time.sleep(10)
+    ```
+    To follow many files at once, check `watch()`.
+    '''
+    def __init__(self, file):
+        self.file = os.path.abspath(file)
+        '''Full path of the followed file.'''
+        self.offset = 0
+        '''Number of bytes already parsed.'''
+        self.state = {}
+        '''Latest values read from the file.'''
+        self._identity = None
+        self._pending_error = False
+        self.reset()
+
+    @property
+    def finished(self) -> bool:
+        '''`True` if the calculation finished, either with `JOB DONE` or with an error.'''
+        return self.state['JOB DONE'] or bool(self.state['Error'])
+
+    def reset(self) -> None:
+        '''Forgets the parsed data, so that the file is parsed again from the start.'''
+        self.offset = 0
+        self._pending_error = False
+        self.state = {
+            'Energy'                : None,
+            'Total force'           : None,
+            'Total SCF correction'  : None,
+            'Runtime'               : None,
+            'JOB DONE'              : False,
+            'BFGS converged'        : False,
+            'BFGS failed'           : False,
+            'Maxiter reached'       : False,
+            'Error'                 : '',
+            'Success'               : False,
+            'SCF iterations'        : 0,
+            'BFGS steps'            : 0,
+        }
+        return None
+
+    def poll(self) -> list:
+        '''
+        Parses the new lines of the file, returning a list of `(event, value)` tuples.
+        A single `stat` is done when the file did not change.
+        '''
+        try:
+            stat = os.stat(self.file)
+        except FileNotFoundError:
+            return []
+        events = []
+        identity = (stat.st_dev, stat.st_ino)
+        if (self._identity is not None and identity != self._identity) or stat.st_size < self.offset:
+            self.reset()
+            events.append(('Reset', None))
+        self._identity = identity
+        if stat.st_size == self.offset:
+            return events
+        with open(self.file, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        end = data.rfind(b'\n') + 1  # Incomplete lines are parsed on the next poll
+        if end:
+            self.offset += end
+            self._parse(data[:end].decode(errors='replace'), events)
+        return events
+
+    def _parse(self, text:str, events:list) -> None:
+        '''Parses the complete lines of a `text` chunk, updating the `state` and the list of `events`.'''
+        state = self.state
+        if self._pending_error:
+            self._pending_error = False
+            line_end = text.find('\n')
+            state['Error'] = text[:line_end].strip()
+            events.append(('Error', state['Error']))
+        for match in _follow_pattern.finditer(text):
+            key = match.group()
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            line_end = text.find('\n', match.end())
+            line = text[line_start:line_end]
+            if key == 'iteration #':
+                state['SCF iterations'] += 1
+                events.append(('SCF iteration', _to_int(number(line, key))))
+            elif key == 'number of bfgs steps':
+                state['BFGS steps'] += 1
+                events.append(('BFGS step', _to_int(number(line, key))))
+            elif key == '!    total energy':
+                state['Energy'] = number(line, key)
+                events.append(('Energy', state['Energy']))
+            elif key == 'Total force':
+                state['Total force'] = number(line, key)
+                state['Total SCF correction'] = number(line, 'Total SCF correction')
+                events.append(('Total force', state['Total force']))
+            elif key == 'PWSCF':
+                if 'CPU' in line:
+                    state['Runtime'] = string(line, key, 'CPU')
+                    events.append(('Runtime', state['Runtime']))
+            elif key == 'Error in routine':
+                next_end = text.find('\n', line_end + 1)
+                if next_end == -1:
+                    self._pending_error = True
+                else:
+                    state['Error'] = text[line_end+1:next_end].strip()
+                    events.append(('Error', state['Error']))
+            else:
+                event = _follow_keys[key]
+                state[event] = True
+                events.append((event, True))
+        state['Success'] = state['JOB DONE'] and not state['BFGS failed'] and not state['Maxiter reached'] and not state['Error']
+        return None
+
+
+def _to_int(value):
+    '''Converts a float `value` to int, keeping `None`.'''
+    return None if value is None else int(value)
+
+
+_follow_keys = {
+    'iteration #'                          : 'SCF iteration',
+    'number of bfgs steps'                 : 'BFGS step',
+    '!    total energy'                    : 'Energy',
+    'Total force'                          : 'Total force',
+    'PWSCF'                                : 'Runtime',
+    'JOB DONE.'                            : 'JOB DONE',
+    'bfgs converged'                       : 'BFGS converged',
+    'bfgs failed'                          : 'BFGS failed',
+    'Maximum number of iterations reached' : 'Maxiter reached',
+    'Error in routine'                     : 'Error',
+}
+'''Keywords searched by `Follower`, and their events.'''
+
+_follow_pattern = re.compile('|'.join(re.escape(key) for key in _follow_keys))
+'''Single pattern to find all the keywords of `Follower` in one scan of the new data.'''
+
+
+def watch(files, interval:float=5.0, timeout:float=None):
+    '''
+    Follows several Quantum ESPRESSO output `files` at once,
+    yielding `(file, event, value)` tuples as the calculations progress; see `Follower` for the events.
+    The files are polled every `interval` seconds, which only needs a `stat` for each unchanged file,
+    so the cost is proportional to the new data rather than to the size of the files.
+    Files that do not exist yet are followed as soon as they are created.
+    Stops when all the calculations finished, or after `timeout` seconds.
+    '''
+    if isinstance(files, str):
+        files = [files]
+    followers = [Follower(file) for file in files]
+    start = time.monotonic()
+    while followers:
+        for follower in followers:
+            for event, value in follower.poll():
+                yield follower.file, event, value
+        followers = [follower for follower in followers if not follower.finished]
+        if not followers:
+            break
+        if timeout is not None and time.monotonic() - start >= timeout:
+            break
+        time.sleep(interval)
+
+
+def _read_nat(file) -> int:
+    '''
+    Returns the number of atoms of a Quantum ESPRESSO output `file`.
+    '''
+    nat_line = find('number of atoms/cell', file, 1)
+    if not nat_line:
+        raise ValueError(f'Number of atoms not found in {file}')
+    return int(number(nat_line[0], 'number of atoms/cell'))
+
+
+def _read_block(mm, pos:int, lines:int, columns:slice):
+    '''
+    Parses a numeric block of `lines` from the memory map `mm`, starting at `pos` and skipping blank lines.
+    Returns a NumPy array with the given `columns`, or `None` if the block is incomplete.
+    Splitting the whole block and converting the selected columns at once
+    is faster than parsing it line by line, which is only done if the lines have different lengths,
+    such as the positions of a relaxation where only some atoms have `if_pos` constraints.
+    '''
+    pattern = _block_patterns.get(lines)
+    if pattern is None:
+        pattern = re.compile(rb'\s*((?:[^\n]*\n){%d})' % lines)
+        _block_patterns[lines] = pattern
+    match = pattern.match(mm, pos)
+    if not match:
+        return None
+    block = match.group(1).translate(_fortran_exponent)
+    tokens = block.split()
+    ncols = len(tokens) // lines
+    first_line = block[:block.find(b'\n')]
+    last_line = block[block.rfind(b'\n', 0, len(block) - 1) + 1:]
+    if len(tokens) % lines or len(first_line.split()) != ncols or len(last_line.split()) != ncols:
+        return _read_block_lines(block, columns)
+    if columns.stop > ncols:
+        return None
+    selected = []
+    for column in range(columns.start, columns.stop):
+        selected += tokens[column::ncols]
+    try:
+        values = np.array(list(map(float, selected)))
+    except ValueError:
+        return None
+    return values.reshape(-1, lines).T
+
+
+def _read_block_lines(block:bytes, columns:slice):
+    '''
+    Same as `_read_block()`, parsing the `columns` of each line of the `block` separately.
+    '''
+    rows = [line.split()[columns] for line in block.splitlines()]
+    if any(len(row) != columns.stop - columns.start for row in rows):
+        return None
+    try:
+        return np.array(rows, dtype=float)
+    except ValueError:
+        return None
+
+
+_block_patterns = {}
+'''Compiled patterns to read blocks with a given number of lines.'''
+
+_fortran_exponent = bytes.maketrans(b'dD', b'ee')
+'''
+Translation table for Fortran exponents such as `1.0D-6`.
+Only numeric columns are parsed, so other letters of the block can be safely changed.
+'''
+
+
 def read_dir(folder, input_str:str='.in', output_str:str='.out') -> pd.DataFrame:
     '''
     Takes a `folder` containing a Quantum ESPRESSO calculation,
@@ -150,66 +709,456 @@ def read_dir(folder, input_str:str='.in', output_str:str='.out') -> pd.DataFrame
     return df
 
 
-def read_dirs(directory, input_str:str='.in', output_str:str='.out', calc_splitter='_', calc_type_index=0, calc_id_index=1):
+def read_dirs(directory,
+              input_str:str='.in',
+              output_str:str='.out',
+              calc_splitter='_',
+              calc_type_index=0,
+              calc_id_index=1,
+              workers:int=1,
+              cache=False,
+              sink='csv',
+              batch_size:int=1000) -> pd.DataFrame:
     '''
     Calls recursively `read_dir()`, reading Quantum ESPRESSO calculations
     from all the subfolders inside the given `directory`.
-    The results are saved to CSV files inside the current directory.
+    The results are saved to files inside the `directory`, and returned as a single DataFrame,
+    with the calculation type in the `'Type'` column.
     Input and output files are determined automatically, but must be specified with
     `input_str` and `output_str` if more than one file ends with `.in` or `.out`.
 
-    To properly group the calculations per type, saving separated CSVs for each calculation type,
+    To properly group the calculations per type, saving separated files for each calculation type,
     you can modify `calc_splitter` ('_' by default), `calc_type_index` (0) and `calc_id_index` (1).
     With these default values, a subfolder named './CalculationType_CalculationID_AdditionalText/'
     will be interpreted as follows:
-    - Calculation type: 'CalculationType' (The output CSV will be named after this)
+    - Calculation type: 'CalculationType' (The output file will be named after this)
     - CalculationID: 'CalculationID' (Stored in the 'ID' column of the resulting dataframe)
 
     If everything fails, the subfolder name will be used.
+
+    The results are saved as CSV files by default. Set `sink='parquet'` or `sink='feather'`
+    to save them as typed columnar files, which are much faster to load again;
+    these require the optional `pyarrow` package.
+    The output columns are stored as float64 values, booleans,
+    or categories for `'Error'` and `'Runtime'`; numeric input values are stored as float64.
+    The files are written incrementally every `batch_size` calculations,
+    so the results read so far are kept even if the process is stopped.
+    The columns of Parquet and Feather files are fixed by their first batch;
+    new columns found in later batches are only kept in the returned DataFrame.
+    A custom `sink(calc, df)` function can be used instead,
+    which is called with the new rows of each calculation type after each batch.
+    Set `sink=None` to not save any file.
+
+    The folders can be read in parallel by setting the number of processes with `workers`,
+    or `workers=None` to use all the available CPU cores.
+    The original ordering of the calculations is preserved.
+    Note that parallel reading requires the calling script to be protected
+    with an `if __name__ == '__main__':` block on systems that do not fork processes.
+
+    To re-read the `directory` faster while the calculations are still running, set `cache=True`.
+    The results are then stored in a SQLite file inside the `directory`, named after `cache_file`,
+    or in a custom path if `cache` is a string;
+    on later runs, only the calculations whose input or output files changed
+    (according to their size and modification time) are read again.
+    The cache is automatically reset when updating Thoth; to reset it manually, just remove the file.
+    To also avoid listing the same folders several times, set `thoth.file.cache_ttl`.
     '''
     print(f'Reading all Quantum ESPRESSO calculations from {directory} ...')
-    folders = get_list(directory)
+    folders = walk(directory, recursive=False, files=False, dirs=True)
     if not folders:
         raise FileNotFoundError('The directory is empty!')
-    # Separate calculations by their title in an array
-    calc_types = []
-    folders.sort()
+    # Separate calculations by their title in a single pass
+    calc_names = []
+    calc_ids = []
     for folder in folders:
-        if not os.path.isdir(folder):
-            folders.remove(folder)
-            continue
         folder_name = os.path.basename(folder)
         try:
             calc_name = folder_name.split(calc_splitter)[calc_type_index]
-        except:
+        except IndexError:
             calc_name = folder_name
-        if not calc_name in calc_types:
-            calc_types.append(calc_name)
-    len_folders = len(folders)
-    total_success_counter = 0
-    for calc in calc_types:
-        len_calcs = 0
-        success_counter = 0
-        results = pd.DataFrame()
-        for folder in folders:
-            if not calc in folder:
-                continue
-            len_calcs += 1
-            folder_name = os.path.basename(folder)
-            try:
-                calc_id = folder_name.split(calc_splitter)[calc_id_index]
-            except:
-                calc_id = folder_name
-            df: pd.DataFrame = read_dir(folder, input_str, output_str)
-            if df is None:
-                continue
-            df.insert(0, 'ID', calc_id)
+        try:
+            calc_id = folder_name.split(calc_splitter)[calc_id_index]
+        except IndexError:
+            calc_id = folder_name
+        calc_names.append(calc_name)
+        calc_ids.append(calc_id)
+    calcs = list(dict.fromkeys(calc_names))
+    if cache:
+        if not isinstance(cache, str):
+            cache = os.path.join(directory, cache_file)
+        dfs = _iter_dirs_cached(folders, input_str, output_str, workers, cache, batch_size)
+    else:
+        dfs = _iter_dirs(folders, input_str, output_str, workers)
+    if isinstance(sink, str):
+        sink = _Sink(directory, sink)
+    batch_size = batch_size or len(folders)
+    results = {calc: [] for calc in calcs}
+    pending = {calc: [] for calc in calcs}
+    calc_counter = {calc: 0 for calc in calcs}
+    success_counter = {calc: 0 for calc in calcs}
+    for i, df in enumerate(dfs):
+        calc = calc_names[i]
+        calc_counter[calc] += 1
+        if df is not None:
+            df.insert(0, 'ID', calc_ids[i])
             df = df.dropna(axis=1, how='all')
-            results = pd.concat([results, df], axis=0, ignore_index=True)
+            pending[calc].append(df)
             if df['Success'][0]:
-                success_counter += 1
-                total_success_counter += 1
-        results.to_csv(os.path.join(directory, calc+'.csv'))
-        print(f'Saved to CSV: {calc} ({success_counter} successful calculations out of {len_calcs})')
-    print(f'Total successful calculations: {total_success_counter} out of {len_folders}')
+                success_counter[calc] += 1
+        if (i + 1) % batch_size == 0 or i + 1 == len(folders):
+            for calc, rows in pending.items():
+                if not rows:
+                    continue
+                batch = _typed(pd.concat(rows, axis=0, ignore_index=True))
+                results[calc].append(batch)
+                if sink:
+                    sink(calc, batch)
+                pending[calc] = []
+    if isinstance(sink, _Sink):
+        sink.close(calcs)
+    frames = []
+    for calc in calcs:
+        print(f'Saved: {calc} ({success_counter[calc]} successful calculations out of {calc_counter[calc]})')
+        if results[calc]:
+            df = pd.concat(results[calc], axis=0, ignore_index=True)
+            df.insert(0, 'Type', calc)
+            frames.append(df)
+    print(f'Total successful calculations: {sum(success_counter.values())} out of {len(folders)}')
+    if not frames:
+        return pd.DataFrame()
+    return _typed(pd.concat(frames, axis=0, ignore_index=True))
+
+
+def run_dirs(directory,
+             command:str='mpirun -np {ranks} pw.x -inp {input} > {output}',
+             cores:int=None,
+             ranks:int=1,
+             threads:int=1,
+             input_str:str='.in',
+             output_str:str='.out',
+             timeout:float=None,
+             retries:int=0,
+             state=True,
+             force:bool=False) -> dict:
+    '''
+    Runs the Quantum ESPRESSO calculations of all the subfolders inside the given `directory`,
+    with the same layout expected by `read_dirs()`, packing them onto the available `cores`.
+    By default, all the CPU cores are used.
+
+    The `command` is formatted for each calculation with the `{input}` and `{output}` file names,
+    the `{folder}` path, and the number of MPI `{ranks}` and OpenMP `{threads}` per job,
+    and it runs inside the calculation folder with `OMP_NUM_THREADS` set to `threads`.
+    The output file is named after the input file, replacing `input_str` with `output_str`,
+    unless an output file already exists.
+    Up to `cores // (ranks * threads)` calculations run at the same time.
+    Jobs running longer than `timeout` seconds are killed,
+    and failed jobs are run again up to `retries` times; see `thoth.call.batch()`.
+
+    Calculations whose output already reports `Success` with `read_out()` are skipped,
+    unless `force=True`. The state of the queue is saved after each job finishes,
+    in a JSON file inside the `directory` named after `queue_file`,
+    or in a custom path if `state` is a string; use `state=False` to disable it.
+    If the scheduler is stopped, running it again resumes the queue,
+    skipping the calculations that were already done if their output reports `Success`.
+    Folders with more than one file matching `input_str` or `output_str` are not run,
+    and are marked as `'failed'`.
+
+    Returns a dict with the state of each calculation folder:
+    its `'status'` (`'done'`, `'failed'`, `'skipped'` or `'pending'`),
+    `'returncode'` and number of `'attempts'`.
+    '''
+    cores = cores or os.cpu_count() or 1
+    workers = max(1, cores // (ranks * threads))
+    if state and not isinstance(state, str):
+        state = os.path.join(directory, queue_file)
+    jobs = _load_queue(state) if state and not force else {}
+    folders = walk(directory, recursive=False, files=False, dirs=True)
+    queue = []
+    for folder in folders:
+        name = os.path.basename(folder)
+        try:
+            input_file = get(folder, input_str)
+        except FileNotFoundError:
+            continue
+        except FileExistsError:
+            print(f'Skipping due to more than one input file at {folder}')
+            jobs[name] = {'status': 'failed', 'returncode': None, 'attempts': jobs.get(name, {}).get('attempts', 0)}
+            continue
+        job = jobs.setdefault(name, {'status': 'pending', 'returncode': None, 'attempts': 0})
+        try:
+            output_file = get(folder, output_str)
+        except FileNotFoundError:
+            output_file = None
+        except FileExistsError:
+            print(f'Skipping due to more than one output file at {folder}')
+            job['status'] = 'failed'
+            continue
+        # Jobs done in a previous run are checked again, since a zero return code does not mean convergence
+        if output_file and os.path.getsize(output_file) and not force:
+            if read_out(output_file)['Success'][0]:
+                if job['status'] != 'done':
+                    job['status'] = 'skipped'
+                continue
+        if not output_file:
+            input_name = os.path.basename(input_file)
+            if input_name.endswith(input_str):
+                input_name = input_name[:-len(input_str)]
+            output_file = input_name + output_str
+        job['status'] = 'pending'
+        job_command = command.format(
+            input=os.path.basename(input_file),
+            output=os.path.basename(output_file),
+            folder=folder,
+            ranks=ranks,
+            threads=threads)
+        queue.append((name, (job_command, folder, {'OMP_NUM_THREADS': threads})))
+    print(f'Running {len(queue)} calculations from {directory} on {cores} cores, {workers} at a time ...')
+    if state:
+        _save_queue(state, jobs)
+    def update(index, result):
+        job = jobs[queue[index][0]]
+        job['status'] = 'done' if result.returncode == 0 else 'failed'
+        job['returncode'] = result.returncode
+        job['attempts'] += result.attempts
+        if state:
+            _save_queue(state, jobs)
+    batch([job for _, job in queue], workers, timeout, retries, callback=update)
+    done = sum(1 for job in jobs.values() if job['status'] in ('done', 'skipped'))
+    print(f'Finished calculations: {done} out of {len(jobs)}')
+    return jobs
+
+
+def _load_queue(file) -> dict:
+    '''Loads the state of the queue of `run_dirs()` from a JSON `file`, if it exists and was written by this Thoth version.'''
+    try:
+        with open(file, 'r') as f:
+            saved = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if saved.get('version') != version:
+        return {}
+    return saved.get('jobs', {})
+
+
+def _save_queue(file, jobs:dict) -> None:
+    '''Atomically saves the state of the queue of `run_dirs()` to a JSON `file`.'''
+    directory = os.path.dirname(os.path.abspath(file))
+    fd, temp_path = tempfile.mkstemp(prefix='.thoth_', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': version, 'jobs': jobs}, f, indent=1)
+        os.replace(temp_path, file)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _iter_dirs(folders:list, input_str:str='.in', output_str:str='.out', workers:int=1):
+    '''
+    Calls `read_dir()` for all the `folders`, yielding the dataframes in the same order.
+    The folders are distributed in chunks over a pool of `workers` processes;
+    `workers=None` uses all the available CPU cores, and `workers=1` reads them sequentially.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(folders))
+    if workers <= 1:
+        for folder in folders:
+            yield read_dir(folder, input_str, output_str)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(folders) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(read_dir, folders, repeat(input_str), repeat(output_str), chunksize=chunksize)
+
+
+def _iter_dirs_cached(folders:list, input_str:str, output_str:str, workers:int, cache:str, batch_size:int=1000):
+    '''
+    Same as `_iter_dirs()`, but reusing the results stored in the SQLite `cache` file
+    for the calculations whose input and output files did not change since the last read.
+    New results are stored in the cache every `batch_size` calculations.
+    The cache is reset if it was written by a different Thoth version.
+    '''
+    connection = sqlite3.connect(cache)
+    try:
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS calcs (folder TEXT PRIMARY KEY, stamp TEXT, row TEXT)')
+            cache_version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if cache_version is None or cache_version[0] != version:
+                connection.execute('DELETE FROM calcs')
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        cached = {folder: (stamp, row) for folder, stamp, row in connection.execute('SELECT folder, stamp, row FROM calcs')}
+        stamps = [_stamp(folder, input_str, output_str) for folder in folders]
+        missing = [i for i, folder in enumerate(folders) if folder not in cached or cached[folder][0] != stamps[i]]
+        print(f'Reusing {len(folders) - len(missing)} cached calculations, reading {len(missing)}')
+        new_dfs = _iter_dirs([folders[i] for i in missing], input_str, output_str, workers)
+        missing = set(missing)
+        updates = []
+        for i, folder in enumerate(folders):
+            if i not in missing:
+                yield pd.DataFrame.from_dict([json.loads(cached[folder][1])])
+                continue
+            df = next(new_dfs)
+            if df is not None:
+                row = json.dumps(df.to_dict('records')[0], default=_to_json)
+                updates.append((folder, stamps[i], row))
+                if len(updates) >= batch_size:
+                    with connection:
+                        connection.executemany('INSERT OR REPLACE INTO calcs VALUES (?, ?, ?)', updates)
+                    updates = []
+            yield df
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO calcs VALUES (?, ?, ?)', updates)
+    finally:
+        connection.close()
+
+
+def _typed(df:pd.DataFrame) -> pd.DataFrame:
+    '''
+    Converts the output columns of a `df` from `read_dirs()` to the types of `_out_dtypes`.
+    '''
+    for column, dtype in _out_dtypes.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+_out_dtypes = {
+    'ID'                    : 'object',
+    'Energy'                : 'float64',
+    'Total force'           : 'float64',
+    'Total SCF correction'  : 'float64',
+    'Runtime'               : 'category',
+    'JOB DONE'              : 'bool',
+    'BFGS converged'        : 'bool',
+    'BFGS failed'           : 'bool',
+    'Maxiter reached'       : 'bool',
+    'Error'                 : 'category',
+    'Success'               : 'bool',
+}
+'''Types of the columns of `read_out()` in the results of `read_dirs()`.'''
 
+
+class _Sink:
+    '''
+    Writes the results of `read_dirs()` incrementally to a file per calculation type inside the `directory`,
+    with the given `format`: `'csv'`, `'parquet'` or `'feather'`.
+    The columns of each file are fixed by the first batch,
+    except for CSV files, which are rewritten with the new columns when needed.
+    '''
+    def __init__(self, directory, format:str):
+        format = format.lower()
+        if format not in ('csv', 'parquet', 'feather'):
+            raise ValueError(f"Unknown sink '{format}', use 'csv', 'parquet' or 'feather'")
+        self.directory = directory
+        self.format = format
+        self.columns = {}
+        self.schemas = {}
+        self.writers = {}
+        self.rows = {}
+
+    def __call__(self, calc:str, df:pd.DataFrame) -> None:
+        if calc not in self.columns:
+            self.columns[calc] = list(df.columns)
+            self.rows[calc] = 0
+        columns = self.columns[calc]
+        new_columns = [column for column in df.columns if column not in columns]
+        rows = len(df)
+        df.index = range(self.rows[calc], self.rows[calc] + rows)
+        path = os.path.join(self.directory, calc + '.' + self.format)
+        if self.format == 'csv':
+            if new_columns:  # Rewrite the previous rows with the new columns
+                df = pd.concat([pd.read_csv(path, index_col=0), df], axis=0)
+                self.columns[calc] = list(df.columns)
+                df.to_csv(path)
+            else:
+                df = df.reindex(columns=columns)
+                df.to_csv(path, mode='a' if self.rows[calc] else 'w', header=not self.rows[calc])
+        else:
+            if new_columns:
+                print(f'Warning: new columns of {calc} not saved to file: {new_columns}')
+            self._write_arrow(calc, df.reindex(columns=columns), path)
+        self.rows[calc] += rows
+        return None
+
+    def _write_arrow(self, calc:str, df:pd.DataFrame, path:str) -> None:
+        '''Appends a `df` to a Parquet or Feather file as a new row group or record batch.'''
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(f"pyarrow is required to save {self.format} files, install it with 'pip install pyarrow'")
+        writer = self.writers.get(calc)
+        if writer is None:
+            self.schemas[calc] = _arrow_schema(df, pa)
+            if self.format == 'parquet':
+                writer = pq.ParquetWriter(path, self.schemas[calc])
+            else:
+                writer = pa.ipc.new_file(path, self.schemas[calc])
+            self.writers[calc] = writer
+        schema = self.schemas[calc]
+        arrays = []
+        for field in schema:
+            column = df[field.name]
+            if pa.types.is_string(field.type) or pa.types.is_dictionary(field.type):
+                column = column.map(lambda value: value if value is None or isinstance(value, str) or value != value else str(value))
+            arrays.append(pa.array(column, type=field.type, from_pandas=True))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        return None
+
+    def close(self, calcs:list) -> None:
+        '''Closes the open files, and writes empty CSV files for calculation types without results.'''
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+        if self.format == 'csv':
+            for calc in calcs:
+                if calc not in self.rows:
+                    pd.DataFrame().to_csv(os.path.join(self.directory, calc + '.csv'))
+        return None
+
+
+def _arrow_schema(df:pd.DataFrame, pa):
+    '''
+    Returns the explicit pyarrow schema of a `df` from `read_dirs()`:
+    float64 for numbers, booleans, strings, and dictionary-encoded strings for categories.
+    '''
+    fields = []
+    for column in df.columns:
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            field_type = pa.dictionary(pa.int32(), pa.string())
+        elif pd.api.types.is_bool_dtype(dtype):
+            field_type = pa.bool_()
+        elif pd.api.types.is_numeric_dtype(dtype):
+            field_type = pa.float64()
+        else:
+            values = df[column].dropna()
+            if len(values) and all(isinstance(value, bool) for value in values):
+                field_type = pa.bool_()
+            else:
+                field_type = pa.string()
+        fields.append(pa.field(str(column), field_type))
+    return pa.schema(fields)
+
+
+def _stamp(folder, input_str:str='.in', output_str:str='.out') -> str:
+    '''
+    Returns a string identifying the current state of the input and output files of a `folder`,
+    with their paths, sizes and modification times.
+    '''
+    stamp = []
+    for file in (get(folder, input_str), get(folder, output_str)):
+        stat = os.stat(file)
+        stamp.extend([file, stat.st_size, stat.st_mtime_ns])
+    return json.dumps(stamp)
+
+
+def _to_json(value):
+    '''
+    Converts NumPy scalars to Python values to store them as JSON.
+    '''
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
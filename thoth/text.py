@@ -2,29 +2,45 @@
 # Description
 Functions to read and manipulate text.
 
+The search functions `find_pos()`, `find_pos_regex()`, `find_pos_many()`, `find()`, `find_many()`
+and `search()` also read compressed files ending in `.gz`, `.xz`, `.bz2` or `.zst`,
+decompressing them by chunks, so that they never have to be extracted to disk or fully loaded in memory.
+Positions refer to the decompressed text.
+Zstandard files require the optional `zstandard` or `pyzstd` packages;
+with `pyzstd`, searches from the end of seekable Zstandard files only decompress their last frames.
+Compressed files cannot be modified.
+
 # Index
 - `find_pos()`
 - `find_pos_regex`
+- `find_pos_many()`
 - `find()`
+- `find_many()`
+- `search()`
+- `iter_search()`
+- `line_index()`
 - `replace()`
 - `replace_line()`
-
-The following functions work, but will be updated for faster performance with `find_pos` and `find_pos_regex`:
-
 - `insert_under()`
 - `replace_under()`
 - `delete_under()`
 - `replace_between()`
 - `delete_between()`
 - `correct_with_dict()`
+- `Edit`
 
 ---
 '''
 
 
 from .file import *
+from collections import deque
+from itertools import islice
 import mmap
+import os
 import re
+import shutil
+import tempfile
 
 
 def find_pos(keyword:str,
@@ -38,10 +54,20 @@ def find_pos(keyword:str,
     This method is faster than `find_pos_regex()`, but does not search for regular expressions.
     '''
     file_path = get(file)
-    positions = []
+    if _compression(file_path):
+        return _stream_positions(file_path, [keyword.encode()], [number_of_matches])[0]
     with open(file_path, 'r+b') as f:
-        mm = mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ)
-    keyword_bytes = keyword.encode()
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            positions = _find_pos(keyword.encode(), mm, number_of_matches)
+    return positions
+
+
+def _find_pos(keyword_bytes:bytes, mm, number_of_matches:int=0) -> list:
+    '''
+    Returns a list of the positions of the `keyword_bytes` in the memory map `mm`,
+    as in `find_pos()`.
+    '''
+    positions = []
     if number_of_matches >= 0:
         start = 0
         while number_of_matches == 0 or len(positions) < number_of_matches:
@@ -73,30 +99,338 @@ def find_pos_regex(keyword:str,
     Defaults to 0 to return all possible matches. Set it to 1 to return only one match,
     or to negative integers to start searching from the end of the file upwards.\n
     This method is slower than `find_pos()`, but it can search for regular expressions.
+    The search runs directly over the memory-mapped file, so the positions are byte offsets as in `find_pos()`.
+    Searches from the end of the file are performed backwards by chunks;
+    in this case, matches longer than 64 kB might be cut.
     '''
     file_path = get(file)
-    positions = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    if number_of_matches > 0:
-        start = 0
-        while len(positions) < number_of_matches:
-            match = re.search(keyword, content[start:])
-            if not match:
-                break
-            match_start = start + match.start()
-            match_end = start + match.end()
-            positions.append((match_start, match_end))
-            start = match_end
-    else:
-        all_matches = list(re.finditer(keyword, content))
-        if number_of_matches == 0:
-            positions = [(match.start(), match.end()) for match in all_matches]
-        else:
-            positions = [(match.start(), match.end()) for match in all_matches[-abs(number_of_matches):]]
+    if _compression(file_path):
+        return _stream_positions(file_path, [keyword.encode()], [number_of_matches], True)[0]
+    with open(file_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            positions = _find_pos_regex(re.compile(keyword.encode()), mm, number_of_matches)
     return positions
 
 
+def _find_pos_regex(pattern, mm, number_of_matches:int=0) -> list:
+    '''
+    Returns a list of the positions of the compiled bytes `pattern` in the memory map `mm`,
+    as in `find_pos_regex()`.
+    '''
+    if number_of_matches >= 0:
+        matches = pattern.finditer(mm)
+        if number_of_matches > 0:
+            matches = islice(matches, number_of_matches)
+        return [(match.start(), match.end()) for match in matches]
+    # Search backwards by windows. Each window is scanned from a bit earlier and until a bit later,
+    # so that the matches close to the limits are the same as in a forward search.
+    positions = deque()
+    window_end = len(mm)
+    while window_end > 0 and len(positions) < abs(number_of_matches):
+        window_start = max(window_end - _SCAN_WINDOW, 0)
+        scan_start = max(window_start - _REGEX_OVERLAP, 0)
+        scan_end = min(window_end + _REGEX_OVERLAP, len(mm))
+        window_positions = []
+        for match in pattern.finditer(mm, scan_start, scan_end):
+            if match.start() >= window_end:
+                break
+            if match.start() >= window_start:
+                window_positions.append((match.start(), match.end()))
+        positions.extendleft(reversed(window_positions))
+        window_end = window_start
+    return list(positions)[-abs(number_of_matches):]
+
+
+_REGEX_OVERLAP = 1 << 16
+'''Bytes added before and after each window when searching regular expressions backwards.'''
+
+
+def find_pos_many(keywords:dict,
+                  file,
+                  number_of_matches:int=0,
+                  regex:bool=False) -> dict:
+    '''
+    Returns a dict with the positions of several `keywords` in a given `file`,
+    reading the file only once.
+    The `keywords` dict contains the names of the keywords as keys, and the keywords as values;
+    the output dict contains the same names, with the list of positions as values.\n
+    The value `number_of_matches` is applied to each keyword as in `find_pos()`.
+    To use regular expressions in the search, set `regex=True`.
+    '''
+    file_path = get(file)
+    keywords_bytes = [keyword.encode() for keyword in keywords.values()]
+    if _compression(file_path):
+        positions = _stream_positions(file_path, keywords_bytes, [number_of_matches] * len(keywords), regex)
+        return dict(zip(keywords.keys(), positions))
+    with open(file_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            positions = _scan(mm, keywords_bytes, [number_of_matches] * len(keywords), regex)
+    return dict(zip(keywords.keys(), positions))
+
+
+def _scan(mm, keywords:list, numbers_of_matches:list, regex:bool=False) -> list:
+    '''
+    Walks once through the memory map `mm`, searching all the `keywords` bytes at the same time.
+    Returns a list with the positions found for each keyword,
+    with the corresponding `numbers_of_matches` as in `find_pos()`.
+    Literal keywords are searched with mmap.find and rfind over consecutive windows of the file,
+    so that each window is read only once for all keywords, stopping as soon as all keywords are found.
+    If `regex=True`, a single combined regular expression is used instead.
+    '''
+    if regex:
+        return _scan_regex(mm, keywords, numbers_of_matches)
+    results = [[] for _ in keywords]
+    forward = [i for i, n in enumerate(numbers_of_matches) if n >= 0]
+    backward = [i for i, n in enumerate(numbers_of_matches) if n < 0]
+    window = _SCAN_WINDOW
+    # Forward sweep
+    starts = {i: 0 for i in forward}
+    window_start = 0
+    while forward and window_start < len(mm):
+        window_end = window_start + window
+        for i in forward:
+            keyword = keywords[i]
+            n = numbers_of_matches[i]
+            while n == 0 or len(results[i]) < n:
+                pos = mm.find(keyword, max(starts[i], window_start), window_end + len(keyword) - 1)
+                if pos == -1:
+                    break
+                starts[i] = pos + len(keyword)
+                results[i].append((pos, starts[i]))
+        forward = [i for i in forward if numbers_of_matches[i] == 0 or len(results[i]) < numbers_of_matches[i]]
+        window_start = window_end
+    # Backward sweep
+    ends = {i: len(mm) for i in backward}
+    window_end = len(mm)
+    while backward and window_end > 0:
+        window_start = max(window_end - window, 0)
+        for i in backward:
+            keyword = keywords[i]
+            while len(results[i]) < abs(numbers_of_matches[i]):
+                pos = mm.rfind(keyword, window_start, min(ends[i], window_end + len(keyword) - 1))
+                if pos == -1:
+                    break
+                ends[i] = pos
+                results[i].append((pos, pos + len(keyword)))
+        backward = [i for i in backward if len(results[i]) < abs(numbers_of_matches[i])]
+        window_end = window_start
+    for i, n in enumerate(numbers_of_matches):
+        if n < 0:
+            results[i].reverse()
+    return results
+
+
+_SCAN_WINDOW = 1 << 20
+'''Size in bytes of the windows of the file that are searched at once by `_scan()`.'''
+
+
+def _scan_regex(mm, keywords:list, numbers_of_matches:list) -> list:
+    '''
+    Same as `_scan()`, for regular expression `keywords`.
+    The file is walked forward only once with a combined regular expression;
+    for negative `numbers_of_matches` only the last matches are kept.
+    '''
+    patterns = [re.compile(keyword) for keyword in keywords]
+    combined = re.compile(b'|'.join(b'(?:' + keyword + b')' for keyword in keywords))
+    results = [deque(maxlen=abs(n)) if n < 0 else [] for n in numbers_of_matches]
+    next_start = [0] * len(patterns)  # Matches of the same keyword must not overlap
+    only_first = all(n > 0 for n in numbers_of_matches)
+    start = 0
+    while True:
+        match = combined.search(mm, start)
+        if not match:
+            break
+        start = match.start()
+        for i, pattern in enumerate(patterns):
+            n = numbers_of_matches[i]
+            if start < next_start[i] or (n > 0 and len(results[i]) >= n):
+                continue
+            pattern_match = pattern.match(mm, start)
+            if pattern_match:
+                results[i].append((start, pattern_match.end()))
+                next_start[i] = max(pattern_match.end(), start + 1)
+        if only_first and all(len(result) >= n for result, n in zip(results, numbers_of_matches)):
+            break
+        start += 1
+    return [list(result) for result in results]
+
+
+def _compression(file_path:str) -> str:
+    '''
+    Returns the compression format of a file from its extension,
+    `'gz'`, `'xz'`, `'bz2'` or `'zst'`, or `None` if it is not compressed.
+    '''
+    return _compressions.get(os.path.splitext(file_path)[1].lower())
+
+
+_compressions = {'.gz': 'gz', '.xz': 'xz', '.lzma': 'xz', '.bz2': 'bz2', '.zst': 'zst', '.zstd': 'zst'}
+'''Compression formats of the supported file extensions.'''
+
+
+def _open_stream(file_path:str):
+    '''
+    Opens a compressed file, returning a binary file object with the decompressed data.
+    Seekable Zstandard files are opened with `pyzstd.SeekableZstdFile` if available,
+    to allow random access.
+    '''
+    compression = _compression(file_path)
+    if compression == 'gz':
+        import gzip
+        return gzip.open(file_path, 'rb')
+    if compression == 'xz':
+        import lzma
+        return lzma.open(file_path, 'rb')
+    if compression == 'bz2':
+        import bz2
+        return bz2.open(file_path, 'rb')
+    if compression == 'zst':
+        try:
+            import pyzstd
+        except ImportError:
+            pyzstd = None
+        if pyzstd is not None:
+            if hasattr(pyzstd, 'SeekableZstdFile') and pyzstd.SeekableZstdFile.is_seekable_format_file(file_path):
+                return pyzstd.SeekableZstdFile(file_path, 'rb')
+            return pyzstd.ZstdFile(file_path, 'rb')
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstandard or pyzstd is required to read .zst files, install it with 'pip install zstandard'")
+        return zstandard.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def _stream_positions(file_path:str, keywords:list, numbers_of_matches:list, regex:bool=False) -> list:
+    '''
+    Returns a list with the positions of each of the `keywords` bytes in a compressed file,
+    as `_scan()` does for memory maps.
+    '''
+    results = _scan_stream(file_path, keywords, numbers_of_matches, regex)
+    return [[(start, end) for start, end, _ in found] for found in results]
+
+
+def _scan_stream(file_path:str, keywords:list, numbers_of_matches:list, regex:bool=False, additional_lines:int=None) -> list:
+    '''
+    Searches the `keywords` bytes in a compressed file, decompressing it only once by chunks.
+    Returns a list with the matches of each keyword as `(start, end, text)`,
+    with the corresponding `numbers_of_matches` as in `find_pos()`.
+    The `text` contains the lines of the match plus the `additional_lines` as in `find()`,
+    or is `None` if `additional_lines=None`.
+    Compressed streams can only be read forwards, so the last matches are kept while reading the whole file.
+    If the file can be decompressed from any position, as seekable Zstandard files,
+    searches from the end read a window at the end of the file, which grows until all the matches are found.
+    '''
+    with _open_stream(file_path) as f:
+        if all(n < 0 for n in numbers_of_matches) and _is_seekable(f):
+            size = f.seek(0, os.SEEK_END)
+            window = _TAIL_WINDOW
+            while True:
+                start = max(size - window, 0)
+                f.seek(start)
+                if start:  # Start at the next line
+                    start += len(f.readline())
+                results, complete = _scan_chunks(f, start, keywords, numbers_of_matches, regex, additional_lines)
+                if start == 0 or (complete and all(len(found) == -n for found, n in zip(results, numbers_of_matches))):
+                    return results
+                window *= 4
+        return _scan_chunks(f, 0, keywords, numbers_of_matches, regex, additional_lines)[0]
+
+
+_TAIL_WINDOW = 1 << 22
+'''Initial size in bytes of the window searched at the end of seekable compressed files.'''
+
+_STREAM_OVERLAP = 1 << 16
+'''
+Bytes of each chunk of a compressed file that are only searched together with the next chunk,
+so that matches split between chunks are found. Regular expression matches longer than this might be cut.
+'''
+
+
+def _is_seekable(f) -> bool:
+    '''Checks if the decompressed file object `f` supports fast random access.'''
+    return type(f).__name__ == 'SeekableZstdFile'
+
+
+def _scan_chunks(f, base:int, keywords:list, numbers_of_matches:list, regex:bool=False, additional_lines:int=None) -> tuple:
+    '''
+    Searches the `keywords` in the decompressed file object `f`, starting at the line start `base`,
+    as in `_scan_stream()`.
+    The chunks are searched while keeping only the unsearched bytes and the lines needed by pending matches.
+    Returns the list of matches of each keyword, and `False` if the additional lines above a match
+    were needed from before `base`.
+    '''
+    patterns = [re.compile(keyword) for keyword in keywords] if regex else None
+    results = [deque(maxlen=-n) if n < 0 else [] for n in numbers_of_matches]
+    next_start = [base] * len(keywords)
+    active = list(range(len(keywords)))
+    pending = []
+    lines_above = min(additional_lines or 0, 0)
+    first_base = base
+    complete = True
+    overlap = max([_STREAM_OVERLAP] + [len(keyword) for keyword in keywords])
+    data = b''
+    while True:
+        chunk = f.read(_SCAN_WINDOW)
+        eof = not chunk
+        data += chunk
+        accept_end = len(data) if eof else len(data) - overlap
+        if accept_end <= 0 and not eof:
+            continue
+        # Search the matches starting before accept_end, that are complete
+        for i in active:
+            n = numbers_of_matches[i]
+            for start, end in _chunk_matches(data, keywords[i], patterns[i] if regex else None, next_start[i] - base, accept_end):
+                match = [start + base, end + base, None]
+                results[i].append(match)
+                if additional_lines is not None:
+                    pending.append(match)
+                next_start[i] = max(end, start + 1) + base if regex else end + base
+                if n > 0 and len(results[i]) >= n:
+                    break
+            next_start[i] = max(next_start[i], accept_end + base)
+        active = [i for i in active if numbers_of_matches[i] <= 0 or len(results[i]) < numbers_of_matches[i]]
+        # Get the lines of the matches, if they have been fully read
+        waiting = []
+        for match in pending:
+            line_start, line_end = _line_range(data, match[0] - base, match[1] - base, additional_lines)
+            if not eof and line_end >= len(data) - 1:
+                waiting.append(match)
+                continue
+            if line_start == 0 and lines_above and base == first_base and first_base > 0:
+                complete = False
+            match[2] = data[line_start:line_end].decode()
+        pending = waiting
+        if eof or (not active and not pending):
+            break
+        # Drop the bytes that are not needed anymore
+        keep = _line_range(data, accept_end, accept_end, lines_above)[0]
+        for match in pending:
+            keep = min(keep, _line_range(data, match[0] - base, match[0] - base, lines_above)[0])
+        data = data[keep:]
+        base += keep
+    return [[tuple(match) for match in found] for found in results], complete
+
+
+def _chunk_matches(data:bytes, keyword:bytes, pattern, start:int, accept_end:int):
+    '''
+    Yields the `(start, end)` positions of the non-overlapping matches of a `keyword`
+    in the `data` bytes, or of its compiled `pattern` if provided,
+    starting at `start` and before `accept_end`.
+    '''
+    if pattern is not None:
+        for match in pattern.finditer(data, start):
+            if match.start() >= accept_end:
+                return
+            yield match.start(), match.end()
+        return
+    while True:
+        pos = data.find(keyword, start, accept_end + len(keyword) - 1)
+        if pos == -1:
+            return
+        start = pos + len(keyword)
+        yield pos, start
+
+
 def find(keyword:str,
          file:str,
          number_of_matches:int=0,
@@ -121,44 +455,264 @@ def find(keyword:str,
     By default regex search is deactivated, using the faster mmap.find and rfind methods instead.
     '''
     file_path = get(file)
-    matches = []
-    if regex:
-        positions = find_pos_regex(keyword, file, number_of_matches)
+    if _compression(file_path):
+        found = _scan_stream(file_path, [keyword.encode()], [number_of_matches], regex, additional_lines)[0]
+        matches = [text for _, _, text in found]
     else:
-        positions = find_pos(keyword, file, number_of_matches)
-    with open(file_path, 'r+b') as f:
-        mm = mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ)
-    for start, end in positions:
-        # Get the positions of the full line containing the match
-        line_start = mm.rfind(b'\n', 0, start) + 1
-        line_end = mm.find(b'\n', end, len(mm)-1)
-        # Default values for the start and end of the line
-        if line_start == -1: line_start = 0
-        if line_end == -1: line_end = len(mm) - 1
-        # Adjust the line_end to add additional lines after the match
-        match_start = line_start
-        match_end = line_end
-        if additional_lines > 0:
-            for _ in range(abs(additional_lines)):
-                match_end = mm.find(b'\n', match_end + 1, len(mm)-1)
-                if match_end == -1:
-                    break
-        elif additional_lines < 0:
-            for _ in range(abs(additional_lines)):
-                match_start = mm.rfind(b'\n', 0, match_start - 1) + 1
-                if match_start == -1:
-                    break
-        # Save the matched lines
-        matches.append(mm[match_start:match_end].decode())
+        with open(file_path, 'r+b') as f:
+            with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+                if regex:
+                    positions = _find_pos_regex(re.compile(keyword.encode()), mm, number_of_matches)
+                else:
+                    positions = _find_pos(keyword.encode(), mm, number_of_matches)
+                ranges = _line_ranges(mm, positions, additional_lines, file_path)
+                matches = [mm[start:end].decode() for start, end in ranges]
+    if split_additional_lines:
+        matches = _split_lines(matches)
+    return matches
+
+
+def find_many(keywords:dict,
+              file:str,
+              number_of_matches:int=0,
+              additional_lines:int=0,
+              split_additional_lines:bool=False,
+              regex:bool=False) -> dict:
+    '''
+    Same as `find()`, but for several `keywords` at the same time, reading the file only once.
+    The `keywords` dict contains the names of the keywords as keys, and the keywords as values;
+    returns a dict with the same names, containing the list of matches of each keyword.\n
+    The values `number_of_matches`, `additional_lines` and `split_additional_lines`
+    are applied to each keyword as in `find()`.
+    To use regular expressions in the search, set `regex=True`.
+    ```python
+    >>> keywords = {'energy': '!    total energy', 'force': 'Total force'}
+    >>> thoth.text.find_many(keywords, 'relax.out', -1)
+    {'energy': ['!    total energy    =   -93.44 Ry'], 'force': ['     Total force =     0.000213 ...']}
+    ```
+    '''
+    file_path = get(file)
+    keywords_bytes = [keyword.encode() for keyword in keywords.values()]
+    matches = {}
+    if _compression(file_path):
+        all_found = _scan_stream(file_path, keywords_bytes, [number_of_matches] * len(keywords), regex, additional_lines)
+        for name, found in zip(keywords.keys(), all_found):
+            matches[name] = [text for _, _, text in found]
+    else:
+        with open(file_path, 'r+b') as f:
+            with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+                all_positions = _scan(mm, keywords_bytes, [number_of_matches] * len(keywords), regex)
+                for name, positions in zip(keywords.keys(), all_positions):
+                    ranges = _line_ranges(mm, positions, additional_lines, file_path)
+                    matches[name] = [mm[start:end].decode() for start, end in ranges]
     if split_additional_lines:
-        splitted_matches = []
-        for string in matches:
-            splitted_match = string.splitlines()
-            splitted_matches.extend(splitted_match)
-        matches = splitted_matches
+        for name in matches:
+            matches[name] = _split_lines(matches[name])
     return matches
 
 
+def search(keywords,
+           files,
+           number_of_matches:int=0,
+           additional_lines:int=0,
+           regex:bool=False,
+           glob:str=None,
+           workers:int=None,
+           max_files:int=0) -> dict:
+    '''
+    Searches the `keywords` in many `files` in parallel,
+    returning a dict with the files that contain any keyword and their matches.
+    The `files` can be a list of files, such as the output of `thoth.file.get_list()`,
+    or a directory, searching all the files inside it and its subfolders;
+    in this case the files can be filtered with a `glob` pattern such as `'*.out'`.
+    The `keywords` can be a single keyword, returning the matches as in `find()`,
+    or a dict of keywords as in `find_many()`, returning a dict with the matches of each keyword.
+    The values `number_of_matches`, `additional_lines` and `regex` are applied to each file as in `find()`.
+    The files are distributed over a pool of `workers` processes, by default as many as CPU cores;
+    set `workers=1` to search them sequentially.
+    To stop as soon as `max_files` files have matched, set it to a positive value.
+    ```python
+    >>> thoth.text.search('Error in routine', 'calcs', -1, 1, glob='*.out')
+    {'/calcs/relax_002/relax.out': ['     Error in routine cdiaghg (1):\n     problems computing cholesky']}
+    ```
+    To process the results as they are found, check `iter_search()`.
+    '''
+    return dict(iter_search(keywords, files, number_of_matches, additional_lines, regex, glob, workers, max_files))
+
+
+def iter_search(keywords,
+                files,
+                number_of_matches:int=0,
+                additional_lines:int=0,
+                regex:bool=False,
+                glob:str=None,
+                workers:int=None,
+                max_files:int=0):
+    '''
+    Same as `search()`, but yielding `(file, matches)` tuples as soon as each group of files is searched.
+    The results are not sorted; the pending searches are cancelled after `max_files` matches,
+    or when the generator is closed.
+    '''
+    if isinstance(files, str):
+        files = walk(files, glob) if os.path.isdir(files) else [get(files)]
+    single = isinstance(keywords, str)
+    if single:
+        keywords = {'': keywords}
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(files)))
+    chunksize = max(1, min(_SEARCH_CHUNK, len(files) // (workers * 4)))
+    chunks = [files[i:i+chunksize] for i in range(0, len(files), chunksize)]
+    args = (keywords, number_of_matches, additional_lines, regex)
+    found = 0
+    if workers == 1 or len(chunks) == 1:
+        results = (_search_files(chunk, *args) for chunk in chunks)
+        executor = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        executor = ProcessPoolExecutor(max_workers=workers)
+        futures = [executor.submit(_search_files, chunk, *args) for chunk in chunks]
+        results = (future.result() for future in as_completed(futures))
+    try:
+        for chunk_results in results:
+            for file, matches in chunk_results:
+                yield file, (matches[''] if single else matches)
+                found += 1
+                if max_files and found >= max_files:
+                    return
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _search_files(files:list, keywords:dict, number_of_matches:int, additional_lines:int, regex:bool) -> list:
+    '''
+    Searches the `keywords` in each of the `files` with `find_many()`,
+    returning a list of `(file, matches)` tuples for the files with any match.
+    Empty files, folders, and files that cannot be read or were removed during the search are skipped.
+    '''
+    results = []
+    for file in files:
+        if os.path.isdir(file):
+            continue
+        try:
+            matches = find_many(keywords, file, number_of_matches, additional_lines, False, regex)
+        except (ValueError, OSError):  # Empty files cannot be mapped
+            continue
+        if any(matches.values()):
+            results.append((file, matches))
+    return results
+
+
+_SEARCH_CHUNK = 64
+'''Max number of files searched by each task of `iter_search()`.'''
+
+
+def line_index(file):
+    '''
+    Returns a NumPy array with the byte positions where each line of the `file` starts.\n
+    The index is built with vectorised operations over the memory-mapped file,
+    and is kept in memory to be reused while the size and modification time of the file do not change.
+    It is used by `find()`, `find_many()` and `replace_line()`
+    to get the lines of many matches at once.
+    '''
+    file_path = get(file)
+    stat = os.stat(file_path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    cached = _line_indexes.get(file_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(file_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            index = _build_line_index(mm)
+    _line_indexes.pop(file_path, None)
+    if len(_line_indexes) >= _LINE_INDEX_CACHE_SIZE:
+        _line_indexes.pop(next(iter(_line_indexes)))
+    _line_indexes[file_path] = (stamp, index)
+    return index
+
+
+_line_indexes = {}
+'''Cached line indexes from `line_index()`, as `{file_path: ((size, mtime), index)}`.'''
+
+_LINE_INDEX_CACHE_SIZE = 32
+'''Max number of line indexes kept in memory.'''
+
+_LINE_INDEX_MIN_MATCHES = 500
+'''Min number of matches to use the line index instead of searching the lines of each match.'''
+
+
+def _build_line_index(mm):
+    '''
+    Returns a NumPy array with the positions where each line of the memory map `mm` starts,
+    scanning it by chunks to keep the memory usage low.
+    '''
+    import numpy as np
+    chunk = 1 << 24
+    newlines = [np.zeros(1, dtype=np.int64)]
+    for offset in range(0, len(mm), chunk):
+        data = np.frombuffer(mm, dtype=np.uint8, count=min(chunk, len(mm) - offset), offset=offset)
+        newlines.append(np.flatnonzero(data == 10) + (offset + 1))
+        del data  # The mmap cannot be closed while the array exists
+    return np.concatenate(newlines)
+
+
+def _line_ranges(mm, positions:list, additional_lines:int=0, file_path:str=None) -> list:
+    '''
+    Returns a list with the (start, end) byte positions of the full lines of the memory map `mm`
+    containing each match in `positions`, plus the `additional_lines` below (or above, if negative), as in `find()`.
+    If there are many positions and the `file_path` is provided, the cached `line_index()` is used.
+    '''
+    if file_path is None or len(positions) < _LINE_INDEX_MIN_MATCHES:
+        return [_line_range(mm, start, end, additional_lines) for start, end in positions]
+    import numpy as np
+    index = line_index(file_path)
+    # The last line of the index is empty if the file ends with a newline
+    last_line = len(index) - 1 if index[-1] < len(mm) else len(index) - 2
+    starts, ends = np.array(positions, dtype=np.int64).reshape(-1, 2).T
+    first_lines = np.searchsorted(index, starts, side='right') - 1
+    last_lines = np.searchsorted(index, ends, side='right') - 1
+    if additional_lines > 0:
+        last_lines = np.maximum(last_lines, np.minimum(last_lines + additional_lines, last_line))
+    elif additional_lines < 0:
+        first_lines = np.maximum(first_lines + additional_lines, 0)
+    line_ends = np.append(index[1:] - 1, len(mm))
+    return list(zip(index[first_lines].tolist(), line_ends[last_lines].tolist()))
+
+
+def _line_range(mm, start:int, end:int, additional_lines:int=0) -> tuple:
+    '''
+    Returns the (start, end) byte positions of the full line of the memory map `mm`
+    containing the match between `start` and `end`, plus the `additional_lines`, as in `find()`.
+    '''
+    # Get the positions of the full line containing the match
+    line_start = mm.rfind(b'\n', 0, start) + 1
+    line_end = mm.find(b'\n', end)
+    if line_end == -1:
+        line_end = len(mm)
+    # Adjust the line limits to add the additional lines
+    for _ in range(additional_lines):
+        if line_end >= len(mm) - 1:
+            break
+        line_end = mm.find(b'\n', line_end + 1)
+        if line_end == -1:
+            line_end = len(mm)
+    for _ in range(-additional_lines):
+        if line_start == 0:
+            break
+        line_start = mm.rfind(b'\n', 0, line_start - 1) + 1
+    return line_start, line_end
+
+
+def _split_lines(matches:list) -> list:
+    '''
+    Splits the additional lines of the `matches` into separated list items.
+    '''
+    splitted_matches = []
+    for string in matches:
+        splitted_matches.extend(string.splitlines())
+    return splitted_matches
+
+
 def replace(text:str,
             keyword:str,
             file:str,
@@ -181,14 +735,11 @@ def replace(text:str,
         positions = find_pos_regex(keyword, file, number_of_replacements)
     else:
         positions = find_pos(keyword, file, number_of_replacements)
-    positions.reverse()  # Must start replacing from the end, otherwise the atual positions may change!
-    with open(file_path, 'r+') as f:
-        content = f.read()
-        for start, end in positions:
-            content = "".join([content[:start], text, content[end:]])
-        f.seek(0)
-        f.write(content)
-        f.truncate()
+    if not positions:
+        return None
+    new_text = text.encode()
+    _rewrite(file_path, [(start, end, new_text) for start, end in positions])
+    return None
 
 
 def replace_line(text:str,
@@ -212,39 +763,204 @@ def replace_line(text:str,
         positions = find_pos_regex(keyword, file, number_of_replacements)
     else:
         positions = find_pos(keyword, file, number_of_replacements)
-    positions.reverse()  # Must start replacing from the end, otherwise the atual positions may change!
-    # Open the file in read-write mode
+    if not positions:
+        return None
     with open(file_path, 'r+b') as f:
-        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_WRITE) as mm:
-            for start, end in positions:
-                # Get the positions of the full line containing the match
-                line_start = mm.rfind(b'\n', 0, start) + 1
-                line_end = mm.find(b'\n', end, len(mm))
-                if line_start == -1:
-                    line_start = 0
-                if line_end == -1:
-                    line_end = len(mm)
-                # Replace the line
-                old_line = mm[line_start:line_end]
-                new_line = text.encode()
-                # Directly modify the memory-mapped region
-                if len(new_line) == len(old_line):
-                    mm[line_start:line_end] = new_line
-                else:  # Adjust content for differing line sizes
-                    remaining_content = mm[line_end:]
-                    updated_content = new_line + remaining_content
-                    mm.resize(len(mm) + len(new_line) - len(old_line))
-                    mm[line_start:] = updated_content
-
-
-def insert_under(text:str, keyword:str, file:str, only_first=False) -> None:
-    '''
-    Inserts the given `text` string under the first occurrence
-    of the `keyword` in the given `file`.
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            # Get the positions of the full lines containing the matches
+            lines = sorted(set(_line_ranges(mm, positions, 0, file_path)))
+    new_line = text.encode()
+    _rewrite(file_path, [(line_start, line_end, new_line) for line_start, line_end in lines])
+    return None
+
+
+class Edit:
+    '''
+    Edit session to apply several edits to the same `file` at once.
+    The edits are queued with the methods `replace()`, `replace_line()`, `insert_under()` and `delete_line()`,
+    which take the same arguments as the corresponding functions of this module, except for the `file`.
+    All the keywords are searched with a single scan of the original file when calling `apply()`,
+    and the file is rewritten only once, replacing it atomically with a temporary file.
+    The session can be used as a context manager, which applies the edits on exit if no errors were raised:
+    ```python
+    with thoth.text.Edit('pw.in') as edit:
+        edit.replace('60', 'ECUTWFC')
+        edit.replace_line("  calculation = 'relax'", 'calculation')
+        edit.insert_under('  nosym = .true.', '&SYSTEM', 1)
+        edit.delete_line('K_POINTS', -1)
+    ```
+    All positions refer to the original file, so an edit cannot act on the text introduced by another one.
+    Overlapping edits raise a `ValueError`, and nothing is written.
+    '''
+    def __init__(self, file):
+        self.file = get(file)
+        '''Full path of the file to edit.'''
+        self.operations = []
+        '''Queued edits, as `(operation, text, keyword, number_of_matches, regex)`.'''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.apply()
+        return False
+
+    def replace(self, text:str, keyword:str, number_of_replacements:int=0, regex:bool=False):
+        '''Queues a `replace()` of the `keyword` with the `text`.'''
+        self.operations.append(('replace', text, keyword, number_of_replacements, regex))
+        return self
+
+    def replace_line(self, text:str, keyword:str, number_of_replacements:int=0, regex:bool=False):
+        '''Queues a `replace_line()` of the lines containing the `keyword` with the `text`.'''
+        self.operations.append(('replace_line', text, keyword, number_of_replacements, regex))
+        return self
+
+    def insert_under(self, text:str, keyword:str, number_of_matches:int=0, regex:bool=False):
+        '''Queues the insertion of the `text` as a new line under the lines containing the `keyword`.'''
+        self.operations.append(('insert_under', text, keyword, number_of_matches, regex))
+        return self
+
+    def delete_line(self, keyword:str, number_of_matches:int=0, regex:bool=False):
+        '''Queues the removal of the lines containing the `keyword`.'''
+        self.operations.append(('delete_line', None, keyword, number_of_matches, regex))
+        return self
+
+    def apply(self) -> None:
+        '''
+        Applies all the queued edits in a single rewrite of the file, and empties the queue.
+        '''
+        if not self.operations:
+            return None
+        with open(self.file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+                    edits = self._resolve(mm)
+            else:
+                edits = self._resolve(b'')
+        if edits:
+            _rewrite(self.file, edits)
+        self.operations = []
+        return None
+
+    def _resolve(self, mm) -> list:
+        '''
+        Searches all the keywords in the memory map `mm`,
+        returning the sorted list of `(start, end, new_bytes)` edits.
+        '''
+        positions = [None] * len(self.operations)
+        for regex in (False, True):
+            indices = [i for i, operation in enumerate(self.operations) if bool(operation[4]) == regex]
+            if not indices:
+                continue
+            keywords = [self.operations[i][2].encode() for i in indices]
+            numbers = [self.operations[i][3] for i in indices]
+            for i, found in zip(indices, _scan(mm, keywords, numbers, regex)):
+                positions[i] = found
+        edits = []
+        for (operation, text, keyword, number, regex), found in zip(self.operations, positions):
+            if operation == 'insert_under' and not found:
+                raise ValueError("Didn't find the '" + keyword + "' keyword in " + self.file)
+            if operation == 'replace':
+                edits.extend((start, end, text.encode()) for start, end in found)
+                continue
+            for line_start, line_end in sorted(set(_line_ranges(mm, found))):
+                if operation == 'replace_line':
+                    edits.append((line_start, line_end, text.encode()))
+                elif operation == 'delete_line':
+                    edits.append((line_start, min(line_end + 1, len(mm)), b''))
+                elif line_end < len(mm):  # insert_under
+                    edits.append((line_end + 1, line_end + 1, text.encode() + b'\n'))
+                else:  # The last line has no newline
+                    edits.append((line_end, line_end, b'\n' + text.encode()))
+        edits.sort(key=lambda edit: (edit[0], edit[1]))
+        _check_overlaps(edits, self.file)
+        return edits
+
+
+def _rewrite(file_path:str, edits:list) -> None:
+    '''
+    Rewrites the file at `file_path` applying the `edits`,
+    a sorted list of non-overlapping `(start, end, new_bytes)` tuples.
+    The new content is written to a temporary file in the same folder,
+    which then replaces the original file.
+    '''
+    if _compression(file_path):
+        raise ValueError(f'Compressed files cannot be modified: {file_path}')
+    folder, name = os.path.split(file_path)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=folder)
+    try:
+        with open(file_path, 'rb') as f, os.fdopen(fd, 'wb') as out:
+            position = 0
+            for start, end, new_bytes in edits:
+                _copy_range(f, out, position, start)
+                out.write(new_bytes)
+                position = end
+            _copy_range(f, out, position, os.fstat(f.fileno()).st_size)
+        shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _line_indexes.pop(file_path, None)
+    return None
+
+
+def _copy_range(f, out, start:int, end:int) -> None:
+    '''
+    Copies the bytes between `start` and `end` from the file object `f` to the file object `out`.
+    Large ranges are copied inside the kernel with `os.copy_file_range()` or `os.sendfile()` when available,
+    without going through Python; otherwise, or if these fail, they are copied by chunks.
+    '''
+    global _kernel_copy
+    remaining = end - start
+    if remaining >= _KERNEL_COPY_MIN and _kernel_copy:
+        out.flush()
+        try:
+            while remaining > 0:
+                if _kernel_copy == 'copy_file_range':
+                    copied = os.copy_file_range(f.fileno(), out.fileno(), remaining, start)
+                else:
+                    copied = os.sendfile(out.fileno(), f.fileno(), start, remaining)
+                if copied == 0:
+                    break
+                start += copied
+                remaining -= copied
+        except OSError:
+            # Not supported for these files, try the next method
+            _kernel_copy = 'sendfile' if _kernel_copy == 'copy_file_range' and hasattr(os, 'sendfile') else None
+    f.seek(start)
+    while remaining > 0:
+        chunk = f.read(min(remaining, _SCAN_WINDOW))
+        if not chunk:
+            break
+        out.write(chunk)
+        remaining -= len(chunk)
+    return None
+
+
+_kernel_copy = 'copy_file_range' if hasattr(os, 'copy_file_range') else 'sendfile' if hasattr(os, 'sendfile') else None
+'''Method used by `_copy_range()` to copy large ranges of files inside the kernel, if any.'''
+
+_KERNEL_COPY_MIN = 1 << 16
+'''Min number of bytes to copy inside the kernel, instead of reading and writing them from Python.'''
+
+
+def insert_under(text:str,
+                 keyword:str,
+                 file:str,
+                 number_of_matches:int=0,
+                 regex:bool=False) -> None:
+    '''
+    Inserts the given `text` string as a new line under the lines containing the `keyword` in the given `file`.
     The keyword can be at any position within the line.
-    If `only_first=True`, it will only work
-    at the first instance of the keyword, ignoring the rest.
-    The keyword can be at any position in the line, not just at the beginning.
+    The value `number_of_matches` specifies the number of matches, as in `replace()`:
+    0 to insert the text under all the matches (default), 1 only under the first one, 2, 3...
+    or negative values to start from the end of the file, e.g., -1 to insert it only under the last match.
+    Setting `number_of_matches=True` is the same as 1.
+    To search with regular expressions, set `regex=True`.
+    Raises a ValueError if the keyword is not found.
     ```
     line1
     keyword line2
@@ -252,28 +968,25 @@ def insert_under(text:str, keyword:str, file:str, only_first=False) -> None:
     line3
     ```
     '''
-    file_path = get(file)
-    with open(file_path, 'r') as f:
-        document = f.readlines()
-    indices = (i for i, line in enumerate(document) if keyword in line.strip())
-    if indices:
-        if only_first:
-            document.insert(indices[0] + 1, text + "\n")
-        else:
-            for index in indices:
-                document.insert(index + 1, text + "\n")
-        with open(file_path, 'w') as f:
-            f.writelines(document)
-    else:
-        raise ValueError("Didn't find the '" + keyword + "' keyword in " + file_path)
+    Edit(file).insert_under(text, keyword, number_of_matches, regex).apply()
     return None
 
 
-def replace_under(text:str, keyword:str, file:str) -> None:
+def replace_under(text,
+                  keyword:str,
+                  file:str,
+                  number_of_matches:int=1,
+                  regex:bool=False) -> None:
     '''
-    Replaces the lines under the first occurrence of the `keyword`
-    in the given `filename` with the given `text` string.
-    > TODO: IN THE FUTURE SHOULD BE POSITION-AGNOSTIC. The keyword currently must be at the beginning of the line.
+    Replaces the lines under the line containing the `keyword` in the given `file`
+    with the lines of the `text`, which can be a string with several lines or a list of lines.
+    As many lines as in the `text` are replaced, up to the end of the file.
+    The keyword can be at any position within the line.
+    By default only the lines under the first match are replaced;
+    the value `number_of_matches` specifies the number of matches as in `replace()`:
+    0 for all, 1 for the first one, 2, 3... or negative values to start from the end of the file.
+    To search with regular expressions, set `regex=True`.
+    Raises a ValueError if the keyword is not found, or if the replaced blocks overlap.
     ```
     line1
     keyword line2
@@ -282,24 +995,41 @@ def replace_under(text:str, keyword:str, file:str) -> None:
     ```
     '''
     file_path = get(file)
-    with open(file_path, 'r') as f:
-        document = f.readlines()
-    index = next((i for i, line in enumerate(document) if line.strip().startswith(keyword)), None)
-    if index is not None:
-        for i, row in enumerate(text):
-            if index + 1 + i < len(document):
-                document[index + 1 + i] = row + "\n"
-        with open(file_path, 'w') as f:
-            file.writelines(document)
-    else:
+    rows = text.splitlines() if isinstance(text, str) else list(text)
+    if not os.path.getsize(file_path):
         raise ValueError("Didn't find the '" + keyword + "' keyword in " + file_path)
+    edits = []
+    with open(file_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            positions = _positions(mm, keyword, number_of_matches, regex)
+            if not positions:
+                raise ValueError("Didn't find the '" + keyword + "' keyword in " + file_path)
+            for line_start, line_end in sorted(set(_line_ranges(mm, positions))):
+                if not rows or line_end >= len(mm) - 1:
+                    continue  # Nothing to replace, or nothing under the last line
+                block_end = _line_range(mm, line_end + 1, line_end + 1, len(rows) - 1)[1]
+                replaced = mm[line_end+1:block_end].count(b'\n') + 1
+                new_text = '\n'.join(rows[:replaced]).encode()
+                edits.append((line_end + 1, block_end, new_text))
+    if edits:
+        _check_overlaps(edits, file_path)
+        _rewrite(file_path, edits)
     return None
 
 
-def delete_under(keyword:str, file:str) -> None:
+def delete_under(keyword:str,
+                 file:str,
+                 number_of_matches:int=1,
+                 regex:bool=False) -> None:
     '''
-    Deletes the lines under the first occurrence of the `keyword` in the given `file`.
-    > TODO: IN THE FUTURE SHOULD BE POSITION-AGNOSTIC
+    Deletes all the lines under the line containing the `keyword` in the given `file`.
+    The keyword can be at any position within the line.
+    By default the lines under the first match are deleted;
+    the value `number_of_matches` selects another match, as in `replace()`:
+    2 for the second match, 3... or negative values to start from the end of the file,
+    e.g., -1 to delete the lines under the last match.
+    To search with regular expressions, set `regex=True`.
+    Raises a ValueError if the keyword is not found, or if there are fewer matches than `number_of_matches`.
     ```
     lines...
     keyword
@@ -307,23 +1037,40 @@ def delete_under(keyword:str, file:str) -> None:
     ```
     '''
     file_path = get(file)
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    keep = []
-    for line in lines:
-        if keyword in line:
-            break
-        else:
-            keep.append(line)
-    with open(file, 'w') as f:
-        f.writelines(keep)
+    number_of_matches = number_of_matches or 1
+    if not os.path.getsize(file_path):
+        raise ValueError("Didn't find the '" + keyword + "' keyword in " + file_path)
+    with open(file_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            positions = _positions(mm, keyword, number_of_matches, regex)
+            if not positions:
+                raise ValueError("Didn't find the '" + keyword + "' keyword in " + file_path)
+            if len(positions) < abs(number_of_matches):
+                raise ValueError(f"Found only {len(positions)} of {abs(number_of_matches)} matches of the '{keyword}' keyword in {file_path}")
+            start, end = positions[-1] if number_of_matches >= 0 else positions[0]
+            line_end = _line_range(mm, start, end)[1]
+            size = len(mm)
+    if line_end >= size - 1:
+        return None
+    _rewrite(file_path, [(line_end + 1, size, b'')])
     return None
 
 
-def replace_between(text:str, key1:str, key2:str, file:str) -> None:
+def replace_between(text:str,
+                    key1:str,
+                    key2:str,
+                    file:str,
+                    number_of_matches:int=0,
+                    regex:bool=False) -> None:
     '''
     Replace lines with a given `text`, between the keywords `key1` and `key2`,
-    in a given `file`.
+    in a given `file`. The lines containing the keywords are kept.
+    The keywords can be at any position within the lines.
+    If `key2` is not found after `key1`, the lines are replaced until the end of the file.
+    The value `number_of_matches` specifies the number of blocks starting with `key1`, as in `replace()`:
+    0 to replace all the blocks (default), 1 only the first one, 2, 3...
+    or negative values to start from the end of the file.
+    To search with regular expressions, set `regex=True`.
     ```
     lines...
     key1
@@ -332,14 +1079,24 @@ def replace_between(text:str, key1:str, key2:str, file:str) -> None:
     lines...
     ```
     '''
-    delete_between(key1, key2, file)
-    insert_under(text, key1, file)
+    _edit_between(text, key1, key2, file, number_of_matches, regex)
     return None
 
 
-def delete_between(key1:str, key2:str, file:str) -> None:
+def delete_between(key1:str,
+                   key2:str,
+                   file:str,
+                   number_of_matches:int=0,
+                   regex:bool=False) -> None:
     '''
     Deletes the lines between two keywords in a given `file`.
+    The lines containing the keywords are kept.
+    The keywords can be at any position within the lines.
+    If `key2` is not found after `key1`, the lines are deleted until the end of the file.
+    The value `number_of_matches` specifies the number of blocks starting with `key1`, as in `replace()`:
+    0 to delete all the blocks (default), 1 only the first one, 2, 3...
+    or negative values to start from the end of the file.
+    To search with regular expressions, set `regex=True`.
     ```
     lines...
     key1
@@ -348,34 +1105,80 @@ def delete_between(key1:str, key2:str, file:str) -> None:
     lines...
     ```
     '''
+    _edit_between(None, key1, key2, file, number_of_matches, regex)
+    return None
+
+
+def _edit_between(text:str, key1:str, key2:str, file:str, number_of_matches:int=0, regex:bool=False) -> None:
+    '''
+    Replaces the lines between `key1` and `key2` with the `text`, or deletes them if `text` is `None`.
+    See `replace_between()` and `delete_between()`.
+    Each block ends at the first line containing `key2` after the line with `key1`;
+    lines with `key1` inside a block are deleted with it.
+    '''
     file_path = get(file)
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    keep = []
-    skip = False
-    for line in lines:
-        if key1 in line:
-            skip = True
-        if key2 in line:
-            skip = False
-        if not skip or key1 in line:
-            keep.append(line)
-    with open(file_path, 'w') as f:
-        f.writelines(keep)
+    if not os.path.getsize(file_path):
+        return None
+    new_text = b'' if text is None else text.encode() + b'\n'
+    search = re.compile(key2.encode()).search if regex else None
+    edits = []
+    with open(file_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            block_end = -1
+            for line_start, line_end in _line_ranges(mm, _positions(mm, key1, number_of_matches, regex)):
+                if line_start < block_end:
+                    continue  # Inside the previous block
+                start = min(line_end + 1, size)
+                if regex:
+                    match = search(mm, start)
+                    pos = match.start() if match else -1
+                else:
+                    pos = mm.find(key2.encode(), start)
+                block_end = size if pos == -1 else mm.rfind(b'\n', 0, pos) + 1
+                if line_end == size and new_text:  # The last line has no newline
+                    edits.append((size, size, b'\n' + new_text[:-1]))
+                elif block_end > start or new_text:
+                    edits.append((start, block_end, new_text))
+    if edits:
+        _rewrite(file_path, edits)
+    return None
+
+
+def _positions(mm, keyword:str, number_of_matches:int=0, regex:bool=False) -> list:
+    '''
+    Returns the positions of the `keyword` in the memory map `mm`, as in `find_pos()` or `find_pos_regex()`.
+    '''
+    if regex:
+        return _find_pos_regex(re.compile(keyword.encode()), mm, number_of_matches)
+    return _find_pos(keyword.encode(), mm, number_of_matches)
+
+
+def _check_overlaps(edits:list, file_path:str) -> None:
+    '''
+    Raises a ValueError if any of the sorted `edits` of the file at `file_path` overlap.
+    '''
+    for previous, edit in zip(edits, edits[1:]):
+        if edit[0] < previous[1] or (edit[0] == previous[0] and previous[1] > previous[0]):
+            raise ValueError(f'Overlapping edits at bytes {previous[0]}-{previous[1]} and {edit[0]}-{edit[1]} of {file_path}')
     return None
 
 
 def correct_with_dict(file:str, fixing_dict:dict) -> None:
     '''
     Corrects the given text `file` using the `fixing_dict` dictionary.
+    All the keys are replaced in a single pass over the file, so the replaced values are not corrected again.
+    If several keys match at the same position, the longest one is used.
     '''
     file_path = get(file)
-
-    with open(file_path, 'r+') as f:
-        content = f.read()
-        for key, value in fixing_dict.items():
-            content = content.replace(key, value)
-        f.seek(0)
-        f.write(content)
+    keys = sorted((key.encode() for key in fixing_dict if key), key=len, reverse=True)
+    if not keys or os.path.getsize(file_path) == 0:
+        return None
+    values = {key.encode(): value.encode() for key, value in fixing_dict.items()}
+    pattern = re.compile(b'|'.join(re.escape(key) for key in keys))
+    with open(file_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+            edits = [(match.start(), match.end(), values[match.group()]) for match in pattern.finditer(mm)]
+    if edits:
+        _rewrite(file_path, edits)
     return None
-